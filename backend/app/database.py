@@ -1,13 +1,37 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
+from app.services import metrics
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./farmer_support.db")
+# Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4
+if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
+    SQLALCHEMY_DATABASE_URL = "postgresql://" + SQLALCHEMY_DATABASE_URL[len("postgres://"):]
+
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+# Opt-in async engine for the I/O-bound endpoints (aiosqlite / asyncpg)
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB", "0") == "1"
+
+# Several uvicorn/gunicorn workers sharing one database (see services/coordination.py)
+MULTI_WORKER = os.getenv("MULTI_WORKER", "0") == "1"
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False} if IS_SQLITE else {}
 )
+metrics.instrument_engine(engine)
+
+if IS_SQLITE and MULTI_WORKER:
+    # WAL lets readers in other processes proceed while one process writes
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=10000")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -18,3 +42,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def async_database_url(url: str) -> str:
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    return url
+
+async_engine = None
+AsyncSessionLocal = None
+
+if ASYNC_DB_ENABLED:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL))
+    metrics.instrument_engine(async_engine.sync_engine)
+    # Objects stay readable after commit: lazy refreshes can't run outside an await
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,22 +1,43 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status, File, UploadFile, Request, Header
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 from datetime import timedelta
-from typing import List
+from typing import List, Optional
+import math
+import time
 import uuid
 import os
-import json
 
 from app import models, schemas, auth, database
-from app.database import engine, get_db
+from app.database import engine, get_db, get_async_db
 from app.services.ai_validator import validate_documents
 from app.services.sms import send_sms
+from app.services import (
+    allocation, archive, coordination, duplicates, fast_json, metrics, rate_limit, rolling_allocation, scheme_cache, thumbnails, user_cache
+)
+from app.services.compression import CompressionMiddleware
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Farmer Support System API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cache-invalidation bus poller, only started with MULTI_WORKER=1
+    coordination.start()
+    yield
+    coordination.stop()
+    allocation.shutdown_pool()
+
+app = FastAPI(title="Farmer Support System API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,24 +54,85 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 from fastapi.staticfiles import StaticFiles
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Stay well under SQLite's bound-parameter limit for IN (...) lists
+ALLOCATION_WRITE_BATCH = 500
+
+class UploadFiles(StaticFiles):
+    # Derivatives have content-hashed names and never change; originals can be re-uploaded
+    def file_response(self, full_path, *args, **kwargs):
+        response = super().file_response(full_path, *args, **kwargs)
+        response.headers["Cache-Control"] = (
+            thumbnails.DERIVED_CACHE_CONTROL if thumbnails.is_derived(str(full_path))
+            else thumbnails.ORIGINAL_CACHE_CONTROL
+        )
+        return response
+
 # Create uploads directory if not exists
 os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", UploadFiles(directory="uploads"), name="uploads")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats, token = metrics.start_request()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template (e.g. /apply/{scheme_id}) to keep series bounded
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        elapsed = time.perf_counter() - started
+        if metrics.finish_request(stats, token, request.method, path, status_code, elapsed):
+            await run_in_threadpool(metrics.log_slow_request, stats, request.method, path, status_code, elapsed)
+
+# Outermost, so every API response (including CORS/metrics-wrapped ones) is compressed
+app.add_middleware(CompressionMiddleware)
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+def enforce_rate_limits(*checks):
+    # Runs before any hashing or DB work so bursts are shed cheaply
+    for limiter, key in checks:
+        allowed, retry_after = limiter.hit(key)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+    return checks
+
+def refund_rate_limits(checks):
+    for limiter, key in checks:
+        limiter.refund(key)
+
 # --- AUTH ENDPOINTS ---
 
 @app.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def register(user: schemas.UserCreate, request: Request, db: Session = Depends(get_db)):
+    enforce_rate_limits(
+        (rate_limit.AUTH_BY_IP, client_ip(request)),
+        (rate_limit.AUTH_BY_PHONE, user.phone_number),
+    )
     print(f"REGISTRATION ATTEMPT FOR: {user.phone_number}")
     db_user = db.query(models.User).filter(models.User.phone_number == user.phone_number).first()
     if db_user:
@@ -65,7 +147,12 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         role=user.role
     )
     db.add(new_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Concurrent duplicate registration slipped past the check above
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Phone number already registered")
     db.refresh(new_user)
     print(f"REGISTRATION SUCCESSFUL: {user.phone_number}")
     msg = f"Welcome {new_user.full_name}! Your identity as a {new_user.role} has been registered on SmartAgriAI."
@@ -75,7 +162,11 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return new_user
 
 @app.post("/token", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    enforce_rate_limits(
+        (rate_limit.AUTH_BY_IP, client_ip(request)),
+        (rate_limit.AUTH_BY_PHONE, form_data.username),
+    )
     user = db.query(models.User).filter(models.User.phone_number == form_data.username).first()
     if not user or not auth.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -114,25 +205,53 @@ def calculate_impact_score(income: int, land_size: float, category: str) -> floa
     # Using format to avoid round() overload confusion in some linters
     return float(f"{final_score:.2f}")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def phone_number_from_token(token: str) -> str:
     try:
         payload = auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
         phone_number: str = payload.get("sub")
-        if phone_number is None:
-            raise credentials_exception
     except Exception:
-        raise credentials_exception
-    
+        raise credentials_exception()
+    if phone_number is None:
+        raise credentials_exception()
+    return phone_number
+
+# Plain def: FastAPI runs it in the threadpool, so the blocking query stays off the event loop
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    phone_number = phone_number_from_token(token)
+    user = user_cache.get(phone_number)
+    if user is not None:
+        return user
     user = db.query(models.User).filter(models.User.phone_number == phone_number).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
+    user_cache.put(user)
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    phone_number = phone_number_from_token(token)
+    user = user_cache.get(phone_number)
+    if user is not None:
+        return user
+    result = await db.execute(select(models.User).where(models.User.phone_number == phone_number))
+    user = result.scalars().first()
+    if user is None:
+        raise credentials_exception()
+    user_cache.put(user)
     return user
 
+def cached_json_response(request: Request, body: bytes, etag: str, cache_control: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if scheme_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 def check_admin(user: models.User):
     if user.role not in [models.UserRole.ADMIN, models.UserRole.OFFICER]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
@@ -148,43 +267,80 @@ def create_scheme(scheme: schemas.SchemeCreate, current_user: models.User = Depe
     check_admin(current_user)
     db_scheme = models.Scheme(**scheme.model_dump())
     db.add(db_scheme)
+    db.flush()
+    coordination.publish(db, coordination.SCHEMES, coordination.applications_key(db_scheme.id))
     db.commit()
+    scheme_cache.bump_version()
     db.refresh(db_scheme)
     return db_scheme
 
 @app.get("/schemes", response_model=List[schemas.Scheme])
-def list_schemes(db: Session = Depends(get_db)):
-    return db.query(models.Scheme).all()
+def list_schemes(request: Request, db: Session = Depends(get_db)):
+    catalog = scheme_cache.get_catalog(db)
+    return cached_json_response(request, catalog.body, catalog.etag, scheme_cache.CATALOG_CACHE_CONTROL)
 
 @app.post("/schemes/eligible", response_model=List[schemas.Scheme])
-def get_eligible_schemes(check: schemas.EligibilityCheck, db: Session = Depends(get_db)):
-    schemes = db.query(models.Scheme).all()
-    eligible = []
-    
-    for s in schemes:
-        # Check income (if specified)
-        if s.max_income is not None and check.income > s.max_income:
-            continue
-        
-        # Check land size (if specified)
-        if s.max_land_size is not None and check.land_size > s.max_land_size:
-            continue
-            
-        # Check district (if specified in quotas)
-        import json
-        quotas = s.district_quotas
-        if quotas and isinstance(quotas, str):
-            try:
-                quotas = json.loads(quotas)
-            except:
-                pass
-                
-        if quotas and isinstance(quotas, dict) and check.district not in quotas:
-            continue
-            
-        eligible.append(s)
-        
-    return eligible
+def get_eligible_schemes(check: schemas.EligibilityCheck, request: Request, db: Session = Depends(get_db)):
+    catalog = scheme_cache.get_catalog(db)
+    body = scheme_cache.eligible_body(catalog, check)
+    return cached_json_response(request, body, scheme_cache.make_etag(body), scheme_cache.ELIGIBLE_CACHE_CONTROL)
+
+def commit_rolling_allocation(db: Session, scheme: models.Scheme, district_quotas: dict):
+    # The rolling state already holds the outcome; make sure it still covers
+    # exactly the PENDING rows before writing it out, rebuilding it if not.
+    # Compare ids, not counts: with several workers this state can miss a
+    # reject and an apply made elsewhere that cancel out in the count.
+    state = rolling_allocation.get_state(db, scheme)
+    pending = {row.id for row in db.query(models.Application.id).filter(
+        models.Application.scheme_id == scheme.id,
+        models.Application.status == models.ApplicationStatus.PENDING,
+        models.Application.district.in_(list(district_quotas))
+    )}
+    with state.lock:
+        in_state = {app_id for d in state.districts.values() for app_id in d.location}
+    if pending != in_state:
+        rolling_allocation.invalidate(scheme.id)
+        state = rolling_allocation.get_state(db, scheme)
+
+    with state.lock:
+        winner_ids = [i for d in state.districts.values() for i in d.winner_ids()]
+        waitlist_ids = [i for d in state.districts.values() for i in d.waitlist_ids()]
+
+    for ids, new_status in [
+        (winner_ids, models.ApplicationStatus.PROVISIONALLY_APPROVED),
+        (waitlist_ids, models.ApplicationStatus.WAITING),
+    ]:
+        for i in range(0, len(ids), ALLOCATION_WRITE_BATCH):
+            # Only rows still PENDING: one rejected after the state was built keeps its status
+            db.query(models.Application).filter(
+                models.Application.id.in_(ids[i:i + ALLOCATION_WRITE_BATCH]),
+                models.Application.status == models.ApplicationStatus.PENDING
+            ).update({models.Application.status: new_status}, synchronize_session=False)
+    return winner_ids, waitlist_ids
+
+def allocate_scheme(db: Session, scheme: models.Scheme):
+    district_quotas, reservations = allocation.parse_allocation_config(scheme)
+
+    if rolling_allocation.ENABLED:
+        return commit_rolling_allocation(db, scheme, district_quotas)
+
+    winner_ids, waitlist_ids = [], []
+    apps = db.query(models.Application).filter(
+        models.Application.scheme_id == scheme.id,
+        models.Application.status == models.ApplicationStatus.PENDING
+    ).all()
+    apps_by_id = {a.id: a for a in apps}
+
+    for district, total_seats in district_quotas.items():
+        ranked = allocation.rank([(a.id, a.impact_score, a.category) for a in apps if a.district == district])
+        result = allocation.allocate_district(ranked, total_seats, reservations)
+        for app_id, _, _ in result.allocated:
+            apps_by_id[app_id].status = models.ApplicationStatus.PROVISIONALLY_APPROVED
+            winner_ids.append(app_id)
+        for app_id, _, _ in result.waitlist:
+            apps_by_id[app_id].status = models.ApplicationStatus.WAITING
+            waitlist_ids.append(app_id)
+    return winner_ids, waitlist_ids
 
 @app.post("/schemes/{scheme_id}/allocate")
 def trigger_allocation(scheme_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -192,77 +348,126 @@ def trigger_allocation(scheme_id: int, current_user: models.User = Depends(get_c
     scheme = db.query(models.Scheme).filter(models.Scheme.id == scheme_id).first()
     if not scheme:
         raise HTTPException(status_code=404, detail="Scheme not found")
-    
-    if scheme.allocation_done:
-        raise HTTPException(status_code=400, detail="Allocation already processed and locked")
-
-    apps = db.query(models.Application).filter(
-        models.Application.scheme_id == scheme_id,
-        models.Application.status == models.ApplicationStatus.PENDING
-    ).all()
 
-    # Backend implementation of the allocation algorithm
-    # Parse JSON fields since they are stored as Text
+    # The flag alone can't stop two workers allocating at once, the lock row can
     try:
-        district_quotas: dict = json.loads(scheme.district_quotas) if scheme.district_quotas else {}
-        reservations: dict = json.loads(scheme.reservations) if scheme.reservations else {"scPercentage": 0, "stPercentage": 0}
-    except Exception:
-        district_quotas: dict = {}
-        reservations: dict = {"scPercentage": 0, "stPercentage": 0}
-
-    for district, total_seats in district_quotas.items():
-        district_apps = [a for a in apps if a.district == district]
-        district_apps.sort(key=lambda x: x.impact_score, reverse=True)
-
-        allocated_ids = set()
-        rem_seats = total_seats
-
-        # 1. Reservations
-        # Category-wise loops to avoid nonlocal if it's causing lint issues
-        for cat_name, key in [('SC', 'scPercentage'), ('ST', 'stPercentage')]:
-            perc = reservations.get(key, 0)
-            seats_to_fill = int((perc / 100) * total_seats)
-            filled = 0
-            for app in district_apps:
-                if filled >= seats_to_fill or rem_seats <= 0: break
-                if app.category == cat_name and app.id not in allocated_ids:
-                    app.status = models.ApplicationStatus.PROVISIONALLY_APPROVED
-                    allocated_ids.add(app.id)
-                    rem_seats -= 1
-                    filled += 1
-
-        # 2. Merit-Based Fill
-        for app in district_apps:
-            if rem_seats <= 0: break
-            if app.id not in allocated_ids:
-                app.status = models.ApplicationStatus.PROVISIONALLY_APPROVED
-                allocated_ids.add(app.id)
-                rem_seats -= 1
-
-        # 3. Waitlist
-        for app in district_apps:
-            if app.id not in allocated_ids:
-                app.status = models.ApplicationStatus.WAITING
-
-    scheme.allocation_done = True
-    db.commit()
+        with coordination.scheme_lock(db, scheme_id):
+            # Re-read under the lock: another worker may have just finished
+            db.refresh(scheme)
+            if scheme.allocation_done:
+                raise HTTPException(status_code=400, detail="Allocation already processed and locked")
+
+            winner_ids, waitlist_ids = allocate_scheme(db, scheme)
+            scheme.allocation_done = True
+            coordination.publish(db, coordination.SCHEMES, coordination.applications_key(scheme_id))
+            db.commit()
+    except coordination.LockBusy:
+        raise HTTPException(status_code=409, detail="Allocation for this scheme is already in progress")
+
+    scheme_cache.bump_version()
+    allocation.invalidate_snapshot(scheme_id)
+    rolling_allocation.invalidate(scheme_id)
+
+    metrics.ALLOCATIONS.inc()
+    metrics.ALLOCATED_APPLICATIONS.inc(len(winner_ids), status=models.ApplicationStatus.PROVISIONALLY_APPROVED.value)
+    metrics.ALLOCATED_APPLICATIONS.inc(len(waitlist_ids), status=models.ApplicationStatus.WAITING.value)
     return {"message": f"Allocation processed for {scheme.title}"}
 
+@app.post("/schemes/{scheme_id}/duplicate-sweep")
+def sweep_duplicates(scheme_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Run before /allocate: flags shared Aadhaar numbers and near-duplicate documents across farmer accounts
+    check_admin(current_user)
+    if not db.query(models.Scheme.id).filter(models.Scheme.id == scheme_id).first():
+        raise HTTPException(status_code=404, detail="Scheme not found")
+    return duplicates.sweep(db, scheme_id)
+
+@app.post("/schemes/{scheme_id}/simulate")
+def simulate_allocation(
+    scheme_id: int,
+    request: schemas.AllocationSimulationRequest,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Read-only what-if run: nothing is written and the scheme stays unlocked
+    check_admin(current_user)
+    scheme = db.query(models.Scheme).filter(models.Scheme.id == scheme_id).first()
+    if not scheme:
+        raise HTTPException(status_code=404, detail="Scheme not found")
+
+    default_quotas, default_reservations = allocation.parse_allocation_config(scheme)
+    scenarios = [
+        (
+            sc.district_quotas if sc.district_quotas is not None else default_quotas,
+            sc.reservations if sc.reservations is not None else default_reservations,
+        )
+        for sc in request.scenarios
+    ]
+
+    snapshot = allocation.get_snapshot(db, scheme_id)
+    return {
+        "scheme_id": scheme_id,
+        "pending_applications": snapshot.size,
+        "scenarios": allocation.simulate(snapshot, scenarios),
+    }
+
+@app.get("/schemes/{scheme_id}/cutoffs")
+def get_scheme_cutoffs(scheme_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Signed-in users only: a cold scheme costs a full scan to answer
+    if not rolling_allocation.ENABLED:
+        raise HTTPException(status_code=404, detail="Live ranking is not enabled")
+    scheme = db.query(models.Scheme).filter(models.Scheme.id == scheme_id).first()
+    if not scheme:
+        raise HTTPException(status_code=404, detail="Scheme not found")
+    if scheme.allocation_done:
+        raise HTTPException(status_code=400, detail="Allocation already processed and locked")
+
+    state = rolling_allocation.get_state(db, scheme)
+    with state.lock:
+        districts = {d: ds.summary() for d, ds in state.districts.items()}
+    return {"scheme_id": scheme_id, "districts": districts}
+
 # --- APPLICATION ENDPOINTS ---
 
+def find_idempotent_application(db: Session, farmer_id: int, scheme_id: int, idempotency_key: str):
+    prior = db.query(models.Application).filter(
+        models.Application.farmer_id == farmer_id,
+        models.Application.idempotency_key == idempotency_key
+    ).first()
+    if prior and prior.scheme_id != scheme_id:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different scheme")
+    return prior
+
 @app.post("/apply/{scheme_id}", response_model=schemas.Application)
 def apply_to_scheme(
     scheme_id: int,
     application_data: schemas.ApplicationCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, max_length=128),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    limits = enforce_rate_limits(
+        (rate_limit.APPLY_BY_IP, client_ip(request)),
+        (rate_limit.APPLY_BY_PHONE, current_user.phone_number),
+    )
+
+    # A retried request with the same Idempotency-Key gets the original application back,
+    # and its token back so retries aren't charged as new submits
+    if idempotency_key:
+        replay = find_idempotent_application(db, current_user.id, scheme_id, idempotency_key)
+        if replay:
+            refund_rate_limits(limits)
+            return replay
+
     scheme = db.query(models.Scheme).filter(models.Scheme.id == scheme_id).first()
     if not scheme:
         raise HTTPException(status_code=404, detail="Scheme not found")
+    # Once allocated (and later archived) the duplicate check below no longer sees earlier applications
+    if scheme.allocation_done:
+        raise HTTPException(status_code=400, detail="Applications for this scheme are closed")
     
     # Check if already applied
-    existing = db.query(models.Application).filter(
+    existing = db.query(models.Application.id).filter(
         models.Application.farmer_id == current_user.id,
         models.Application.scheme_id == scheme_id
     ).first()
@@ -284,11 +489,13 @@ def apply_to_scheme(
         status=models.ApplicationStatus.PENDING,
         applicant_name=application_data.applicant_name,
         aadhaar_number=application_data.aadhaar_number,
+        aadhaar_hash=duplicates.aadhaar_hash(application_data.aadhaar_number),
         income=application_data.income,
         land_size=application_data.land_size,
         district=application_data.district,
         category=application_data.category,
-        impact_score=score
+        impact_score=score,
+        idempotency_key=idempotency_key
     )
     db.add(new_app)
     
@@ -306,52 +513,70 @@ def apply_to_scheme(
     )
     db.add(doc_notification)
     
-    # Send SMS (Service)
     msg = f"Your application {application_id} is received."
-    send_sms(current_user.phone_number, msg)
     db.add(models.SMSLog(phone_number=current_user.phone_number, message=msg))
+    coordination.publish(db, coordination.applications_key(scheme_id))
     
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent submit (double click / retry)
+        db.rollback()
+        if idempotency_key:
+            replay = find_idempotent_application(db, current_user.id, scheme_id, idempotency_key)
+            if replay:
+                refund_rate_limits(limits)
+                return replay
+        raise HTTPException(status_code=400, detail="Already applied to this scheme")
+
+    # Send SMS (Service) only once the application is durably stored
+    send_sms(current_user.phone_number, msg)
+    allocation.invalidate_snapshot(scheme_id)
     db.refresh(new_app)
+    if rolling_allocation.ENABLED:
+        rolling_allocation.add_application(
+            scheme_id, new_app.id, score,
+            category=application_data.category,
+            district=application_data.district
+        )
     return new_app
 
-@app.post("/applications/{application_id}/upload")
-async def upload_documents(
-    application_id: str,
-    doc_7_12: UploadFile = File(None),
-    income_cert: UploadFile = File(None),
-    ration_card: UploadFile = File(None),
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    app_record = db.query(models.Application).filter(models.Application.application_id == application_id).first()
-    if not app_record:
-        raise HTTPException(status_code=404, detail="Application not found")
-    
-    if app_record.farmer_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    upload_dir = f"uploads/{application_id}"
-    os.makedirs(upload_dir, exist_ok=True)
+UPLOAD_FIELDS = [
+    ("document_7_12", "7_12"),
+    ("income_certificate", "income"),
+    ("ration_card", "ration"),
+]
 
-    if doc_7_12:
-        path = f"{upload_dir}/7_12_{doc_7_12.filename}"
-        with open(path, "wb") as buffer:
-            buffer.write(await doc_7_12.read())
-        app_record.document_7_12 = path
+def write_file(path: str, data: bytes):
+    with open(path, "wb") as buffer:
+        buffer.write(data)
 
-    if income_cert:
-        path = f"{upload_dir}/income_{income_cert.filename}"
-        with open(path, "wb") as buffer:
-            buffer.write(await income_cert.read())
-        app_record.income_certificate = path
-
-    if ration_card:
-        path = f"{upload_dir}/ration_{ration_card.filename}"
-        with open(path, "wb") as buffer:
-            buffer.write(await ration_card.read())
-        app_record.ration_card = path
+def save_documents(app_record: models.Application, uploads: List[tuple]) -> dict:
+    # Blocking file and image work: async callers run it in the threadpool.
+    # uploads are (field, filename, data); returns the perceptual hash per field
+    upload_dir = f"uploads/{app_record.application_id}"
+    os.makedirs(upload_dir, exist_ok=True)
 
+    prefixes = dict(UPLOAD_FIELDS)
+    previews = dict(app_record.document_previews or {})
+    hashes = {}
+    for field, filename, data in uploads:
+        path = f"{upload_dir}/{prefixes[field]}_{filename}"
+        write_file(path, data)
+        setattr(app_record, field, path)
+
+        # Decoded once for the reviewer previews and the duplicate check
+        image = thumbnails.load_image(path)
+        derived = thumbnails.make_derivatives(path, image)
+        if derived:
+            previews[field] = derived
+        else:
+            previews.pop(field, None)
+        hashes[field] = duplicates.perceptual_hash(image)
+    app_record.document_previews = previews
+    return hashes
+
+def validate_application(app_record: models.Application, findings: List[str]) -> dict:
     # AI VALIDATION TRIGGER
     doc_paths = {}
     if app_record.document_7_12: doc_paths["document_7_12"] = app_record.document_7_12
@@ -368,8 +593,35 @@ async def upload_documents(
     }
     
     ai_result = validate_documents(app_data, doc_paths)
+    if findings:
+        # Near-duplicate scans and Aadhaar numbers shared with other farmer accounts
+        ai_result["status"], ai_result["report"] = duplicates.flag(ai_result["status"], ai_result["report"], findings)
     app_record.ai_validation_status = ai_result["status"]
     app_record.ai_validation_report = ai_result["report"]
+    return ai_result
+
+# Plain def: file writes, image work and queries all run in the threadpool
+@app.post("/applications/{application_id}/upload")
+def upload_documents(
+    application_id: str,
+    doc_7_12: UploadFile = File(None),
+    income_cert: UploadFile = File(None),
+    ration_card: UploadFile = File(None),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    app_record = db.query(models.Application).filter(models.Application.application_id == application_id).first()
+    if not app_record:
+        raise HTTPException(status_code=404, detail="Application not found")
+    
+    if app_record.farmer_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    files = zip([field for field, _ in UPLOAD_FIELDS], [doc_7_12, income_cert, ration_card])
+    uploads = [(field, upload.filename, upload.file.read()) for field, upload in files if upload]
+    hashes = save_documents(app_record, uploads)
+    findings = duplicates.check_upload(db, app_record, hashes)
+    ai_result = validate_application(app_record, findings)
 
     db.commit()
     return {
@@ -377,10 +629,54 @@ async def upload_documents(
         "ai_status": ai_result["status"]
     }
 
+def live_position(db: Session, app_record: models.Application) -> Optional[dict]:
+    state = rolling_allocation.get_state(db, app_record.scheme)
+    district_state = state.districts.get(app_record.district)
+    if district_state is None:
+        raise HTTPException(status_code=404, detail="District has no quota in this scheme")
+    with state.lock:
+        return district_state.position(app_record.id, app_record.impact_score)
+
+@app.get("/applications/{application_id}/rank")
+def get_application_rank(
+    application_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not rolling_allocation.ENABLED:
+        raise HTTPException(status_code=404, detail="Live ranking is not enabled")
+
+    app_record = db.query(models.Application).filter(models.Application.application_id == application_id).first()
+    if not app_record:
+        raise HTTPException(status_code=404, detail="Application not found")
+    if app_record.farmer_id != current_user.id:
+        check_admin(current_user)
+    if app_record.status != models.ApplicationStatus.PENDING:
+        return {"application_id": application_id, "status": app_record.status, "live": False}
+
+    position = live_position(db, app_record)
+    if position is None:
+        # The state predates this application being PENDING; rebuild it once
+        rolling_allocation.invalidate(app_record.scheme_id)
+        position = live_position(db, app_record)
+    if position is None:
+        return {"application_id": application_id, "status": app_record.status, "live": False}
+    return {
+        "application_id": application_id,
+        "status": app_record.status,
+        "live": True,
+        "district": app_record.district,
+        "impact_score": app_record.impact_score,
+        **position,
+    }
+
 # --- DASHBOARD ENDPOINTS ---
 
 @app.get("/farmer/dashboard", response_model=List[schemas.Application])
 def farmer_dashboard(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if fast_json.ENABLED:
+        rows = db.execute(fast_json.application_select().where(models.Application.farmer_id == current_user.id))
+        return fast_json.rows_response(fast_json.APPLICATION_FIELDS, rows)
     return db.query(models.Application).filter(models.Application.farmer_id == current_user.id).all()
 
 @app.get("/farmer/notifications", response_model=List[schemas.Notification])
@@ -390,6 +686,8 @@ def get_notifications(current_user: models.User = Depends(get_current_user), db:
 @app.get("/admin/applications", response_model=List[schemas.Application])
 def admin_dashboard(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     check_admin(current_user)
+    if fast_json.ENABLED:
+        return fast_json.rows_response(fast_json.APPLICATION_FIELDS, db.execute(fast_json.application_select()))
     return db.query(models.Application).all()
 
 @app.post("/admin/applications/{application_id}/status")
@@ -443,10 +741,128 @@ def update_application_status(
         send_sms(farmer.phone_number, message)
         db.add(models.SMSLog(phone_number=farmer.phone_number, message=message))
     
+    coordination.publish(db, coordination.applications_key(app_record.scheme_id))
     db.commit()
+    allocation.invalidate_snapshot(app_record.scheme_id)
+    if old_status == models.ApplicationStatus.PENDING and new_status != old_status:
+        rolling_allocation.remove_application(app_record.scheme_id, app_record.id, app_record.district)
+    elif new_status == models.ApplicationStatus.PENDING and new_status != old_status:
+        rolling_allocation.add_application(
+            app_record.scheme_id, app_record.id, app_record.impact_score,
+            category=app_record.category,
+            district=app_record.district
+        )
     return {"message": f"Status updated to {new_status}"}
 
 @app.get("/admin/sms-logs")
 def get_sms_logs(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     check_admin(current_user)
+    if fast_json.ENABLED:
+        rows = db.execute(fast_json.sms_log_select().order_by(models.SMSLog.sent_at.desc()))
+        return fast_json.rows_response(fast_json.SMS_LOG_FIELDS, rows)
     return db.query(models.SMSLog).order_by(models.SMSLog.sent_at.desc()).all()
+
+# --- ARCHIVE ENDPOINTS ---
+
+@app.post("/admin/archive")
+def archive_closed_schemes(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    check_admin(current_user)
+    return archive.archive_closed_schemes(db)
+
+@app.get("/archive/applications/{application_id}", response_model=schemas.ApplicationHistory)
+def get_archived_application(
+    application_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    history = archive.lookup(db, application_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Archived application not found")
+    if history["application"]["farmer_id"] != current_user.id:
+        check_admin(current_user)
+    return history
+
+# --- ASYNC DB ENDPOINTS ---
+# With ASYNC_DB=1 these replace the sync handlers of the same path and method,
+# so I/O-bound reads keep many requests in flight on one worker instead of
+# each holding a threadpool slot.
+
+async_router = APIRouter()
+
+@async_router.get("/users/me", response_model=schemas.User)
+async def read_users_me_async(current_user: models.User = Depends(get_current_user_async)):
+    return current_user
+
+@async_router.post("/applications/{application_id}/upload")
+async def upload_documents_async(
+    application_id: str,
+    doc_7_12: UploadFile = File(None),
+    income_cert: UploadFile = File(None),
+    ration_card: UploadFile = File(None),
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    result = await db.execute(select(models.Application).where(models.Application.application_id == application_id))
+    app_record = result.scalars().first()
+    if not app_record:
+        raise HTTPException(status_code=404, detail="Application not found")
+
+    if app_record.farmer_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    files = zip([field for field, _ in UPLOAD_FIELDS], [doc_7_12, income_cert, ration_card])
+    uploads = [(field, upload.filename, await upload.read()) for field, upload in files if upload]
+    hashes = await run_in_threadpool(save_documents, app_record, uploads)
+    findings = await duplicates.check_upload_async(db, app_record, hashes)
+    ai_result = validate_application(app_record, findings)
+
+    await db.commit()
+    return {
+        "message": "Documents uploaded and AI validation complete",
+        "ai_status": ai_result["status"]
+    }
+
+@async_router.get("/farmer/dashboard", response_model=List[schemas.Application])
+async def farmer_dashboard_async(current_user: models.User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    if fast_json.ENABLED:
+        rows = await db.execute(fast_json.application_select().where(models.Application.farmer_id == current_user.id))
+        return fast_json.rows_response(fast_json.APPLICATION_FIELDS, rows)
+    # scheme_title reads the relationship, which can't lazy-load outside an await
+    result = await db.execute(
+        select(models.Application).options(selectinload(models.Application.scheme))
+        .where(models.Application.farmer_id == current_user.id)
+    )
+    return result.scalars().all()
+
+@async_router.get("/farmer/notifications", response_model=List[schemas.Notification])
+async def get_notifications_async(current_user: models.User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(models.Notification).where(models.Notification.user_id == current_user.id)
+        .order_by(models.Notification.created_at.desc())
+    )
+    return result.scalars().all()
+
+@async_router.get("/admin/applications", response_model=List[schemas.Application])
+async def admin_dashboard_async(current_user: models.User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    check_admin(current_user)
+    if fast_json.ENABLED:
+        return fast_json.rows_response(fast_json.APPLICATION_FIELDS, await db.execute(fast_json.application_select()))
+    result = await db.execute(select(models.Application).options(selectinload(models.Application.scheme)))
+    return result.scalars().all()
+
+@async_router.get("/admin/sms-logs")
+async def get_sms_logs_async(current_user: models.User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    check_admin(current_user)
+    if fast_json.ENABLED:
+        rows = await db.execute(fast_json.sms_log_select().order_by(models.SMSLog.sent_at.desc()))
+        return fast_json.rows_response(fast_json.SMS_LOG_FIELDS, rows)
+    result = await db.execute(select(models.SMSLog).order_by(models.SMSLog.sent_at.desc()))
+    return result.scalars().all()
+
+if database.ASYNC_DB_ENABLED:
+    overridden = {(route.path, method) for route in async_router.routes for method in route.methods}
+    app.router.routes = [
+        route for route in app.router.routes
+        if not (isinstance(route, APIRoute) and any((route.path, m) in overridden for m in route.methods))
+    ]
+    app.include_router(async_router)
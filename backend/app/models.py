@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, DateTime, Boolean, Float, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, DateTime, Boolean, Float, JSON, UniqueConstraint, Index, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 from app.database import Base
 
+# Shown for applications whose scheme no longer exists
+DEFAULT_SCHEME_TITLE = "General Support Scheme"
+
 class UserRole(str, enum.Enum):
     FARMER = "farmer"
     OFFICER = "officer"
@@ -49,6 +52,13 @@ class Scheme(Base):
 
 class Application(Base):
     __tablename__ = "applications"
+    __table_args__ = (
+        # One application per farmer per scheme, enforced even under concurrent submits
+        UniqueConstraint("farmer_id", "scheme_id", name="uq_applications_farmer_scheme"),
+        Index("ix_applications_farmer_idempotency_key", "farmer_id", "idempotency_key", unique=True),
+        # Same Aadhaar under several farmer accounts in one scheme (services/duplicates.py)
+        Index("ix_applications_scheme_aadhaar_hash", "scheme_id", "aadhaar_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     application_id = Column(String, unique=True, index=True) # Unique generated ID
@@ -59,6 +69,7 @@ class Application(Base):
     # Applicant Details
     applicant_name = Column(String)
     aadhaar_number = Column(String)
+    aadhaar_hash = Column(String, nullable=True) # Keyed hash of the normalized number
     income = Column(Integer)
     land_size = Column(Float)
     district = Column(String)
@@ -69,6 +80,7 @@ class Application(Base):
     document_7_12 = Column(String)
     income_certificate = Column(String)
     ration_card = Column(String)
+    document_previews = Column(JSON, nullable=True) # field -> {"preview": path, "thumbnail": path}
     
     created_at = Column(String, server_default=func.now())
     updated_at = Column(String, onupdate=func.now())
@@ -77,12 +89,15 @@ class Application(Base):
     ai_validation_status = Column(String, default="PENDING") # PENDING, VALID, FLAGGED
     ai_validation_report = Column(JSON, nullable=True) # Extracted data & confidence
 
+    # Client-supplied Idempotency-Key of the /apply request that created this row
+    idempotency_key = Column(String, nullable=True)
+
     farmer = relationship("User", back_populates="applications")
     scheme = relationship("Scheme", back_populates="applications")
 
     @property
     def scheme_title(self):
-        return self.scheme.title if self.scheme else "General Support Scheme"
+        return self.scheme.title if self.scheme else DEFAULT_SCHEME_TITLE
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -102,3 +117,72 @@ class SMSLog(Base):
     phone_number = Column(String, index=True)
     message = Column(Text)
     sent_at = Column(String, server_default=func.now())
+
+class DocumentFingerprint(Base):
+    __tablename__ = "document_fingerprints"
+    __table_args__ = (
+        # A near-duplicate shares at least one 16-bit band of the hash exactly
+        Index("ix_document_fingerprints_scheme_band0", "scheme_id", "band0"),
+        Index("ix_document_fingerprints_scheme_band1", "scheme_id", "band1"),
+        Index("ix_document_fingerprints_scheme_band2", "scheme_id", "band2"),
+        Index("ix_document_fingerprints_scheme_band3", "scheme_id", "band3"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    application_id = Column(Integer, ForeignKey("applications.id"), index=True)
+    scheme_id = Column(Integer)
+    farmer_id = Column(Integer)
+    field = Column(String) # document_7_12, income_certificate, ration_card
+    phash = Column(String) # 64-bit difference hash as 16 hex digits
+    band0 = Column(Integer)
+    band1 = Column(Integer)
+    band2 = Column(Integer)
+    band3 = Column(Integer)
+
+class AllocationLock(Base):
+    __tablename__ = "allocation_locks"
+
+    # One row per scheme, claimed with a compare-and-set on holder
+    scheme_id = Column(Integer, ForeignKey("schemes.id"), primary_key=True)
+    holder = Column(String, nullable=True)
+    acquired_at = Column(Float, nullable=True)
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    # Bumped by writers, polled by every worker to drop its in-memory caches
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# --- Archive tables (see services/archive.py) ---
+# Closed schemes' rows are moved here so the hot tables only hold active seasons
+
+def archive_columns(source: Table):
+    # Same columns as the hot table, without its foreign keys and unique constraints.
+    # The hot table's id is kept as source_id: SQLite reuses ids once the highest rows are
+    # deleted, so it can't be the archive's primary key.
+    return [Column("archive_id", Integer, primary_key=True)] + [
+        Column("source_id" if c.primary_key else c.name, c.type, index=c.primary_key) for c in source.columns
+    ]
+
+archived_applications = Table(
+    "archived_applications", Base.metadata,
+    *archive_columns(Application.__table__),
+    Column("archived_at", String, server_default=func.now()),
+    Index("ix_archived_applications_application_id", "application_id", unique=True),
+    Index("ix_archived_applications_scheme_id", "scheme_id"),
+)
+
+archived_notifications = Table(
+    "archived_notifications", Base.metadata,
+    *archive_columns(Notification.__table__),
+    Column("application_id", String, index=True),
+    Column("archived_at", String, server_default=func.now()),
+)
+
+archived_sms_logs = Table(
+    "archived_sms_logs", Base.metadata,
+    *archive_columns(SMSLog.__table__),
+    Column("application_id", String, index=True),
+    Column("archived_at", String, server_default=func.now()),
+)
@@ -57,6 +57,15 @@ class EligibilityCheck(BaseModel):
     district: str
     category: str
 
+# Allocation Simulation Schemas
+class AllocationScenario(BaseModel):
+    # Anything left out falls back to the scheme's stored configuration
+    district_quotas: Optional[Dict[str, int]] = None
+    reservations: Optional[Dict[str, float]] = None
+
+class AllocationSimulationRequest(BaseModel):
+    scenarios: List[AllocationScenario] = Field(..., min_length=1, max_length=1000)
+
 # Application Schemas
 class ApplicationBase(BaseModel):
     scheme_id: int
@@ -80,6 +89,7 @@ class Application(ApplicationBase):
     document_7_12: Optional[str] = None
     income_certificate: Optional[str] = None
     ration_card: Optional[str] = None
+    document_previews: Optional[Dict[str, Dict[str, str]]] = None
     scheme_title: Optional[str] = None
     ai_validation_status: str = "PENDING"
     ai_validation_report: Optional[Dict[str, Any]] = None
@@ -100,3 +110,16 @@ class Notification(NotificationBase):
 
     class Config:
         from_attributes = True
+
+# Archive Schemas
+class ArchivedSMSLog(BaseModel):
+    id: int
+    phone_number: str
+    message: str
+    sent_at: str
+
+class ApplicationHistory(BaseModel):
+    application: Application
+    archived_at: str
+    notifications: List[Notification]
+    sms_logs: List[ArchivedSMSLog]
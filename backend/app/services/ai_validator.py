@@ -1,6 +1,8 @@
 import random
 from typing import Dict, Any
 
+from app.services import metrics
+
 def validate_documents(app_data: Dict[str, Any], doc_paths: Dict[str, str]) -> Dict[str, Any]:
     """
     Simulated AI validation logic.
@@ -24,6 +26,7 @@ def validate_documents(app_data: Dict[str, Any], doc_paths: Dict[str, str]) -> D
     has_income = "income_certificate" in doc_paths
     
     if not has_7_12 or not has_income:
+        metrics.AI_VALIDATIONS.inc(status="FLAGGED")
         return {"status": "FLAGGED", "report": {"error": "Missing critical documents for AI scan"}}
 
     # Mock extraction from "Image OCR"
@@ -44,6 +47,7 @@ def validate_documents(app_data: Dict[str, Any], doc_paths: Dict[str, str]) -> D
         }
         status = "VALID"
 
+    metrics.AI_VALIDATIONS.inc(status=status)
     return {
         "status": status,
         "report": report
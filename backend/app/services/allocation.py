@@ -0,0 +1,208 @@
+"""
+Seat allocation rules shared by the real allocation run and the what-if
+simulator.
+
+Candidates are plain (id, impact_score, category) tuples so the same code can
+run over ORM rows, cached snapshots or inside worker processes.
+"""
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+Candidate = Tuple[int, float, str]
+
+RESERVED_CATEGORIES = [("SC", "scPercentage"), ("ST", "stPercentage")]
+DEFAULT_RESERVATIONS = {"scPercentage": 0, "stPercentage": 0}
+
+# Simulations smaller than this (candidates x scenarios) run inline: shipping the
+# snapshot to worker processes costs more than the allocation itself.
+PARALLEL_THRESHOLD = 200000
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+
+
+def parse_allocation_config(scheme) -> Tuple[dict, dict]:
+    # JSON fields are stored as Text on the scheme
+    try:
+        district_quotas = json.loads(scheme.district_quotas) if scheme.district_quotas else {}
+        reservations = json.loads(scheme.reservations) if scheme.reservations else dict(DEFAULT_RESERVATIONS)
+    except Exception:
+        district_quotas = {}
+        reservations = dict(DEFAULT_RESERVATIONS)
+    return district_quotas, reservations
+
+
+def rank(candidates: Sequence[Candidate]) -> List[Candidate]:
+    # Highest score first, earlier applications win ties
+    return sorted(candidates, key=lambda c: (-c[1], c[0]))
+
+
+class DistrictResult(NamedTuple):
+    allocated: List[Candidate]
+    waitlist: List[Candidate]
+    reserved: Dict[str, int]
+
+
+def allocate_district(ranked: Sequence[Candidate], total_seats, reservations: dict) -> DistrictResult:
+    """Reserved seats first (SC, then ST), then merit fill, rest waitlisted."""
+    allocated: List[Candidate] = []
+    allocated_ids = set()
+    reserved: Dict[str, int] = {}
+    rem_seats = total_seats
+
+    for cat_name, key in RESERVED_CATEGORIES:
+        perc = reservations.get(key, 0)
+        seats_to_fill = int((perc / 100) * total_seats)
+        filled = 0
+        for cand in ranked:
+            if filled >= seats_to_fill or rem_seats <= 0:
+                break
+            if cand[2] == cat_name and cand[0] not in allocated_ids:
+                allocated.append(cand)
+                allocated_ids.add(cand[0])
+                rem_seats -= 1
+                filled += 1
+        reserved[cat_name] = filled
+
+    for cand in ranked:
+        if rem_seats <= 0:
+            break
+        if cand[0] not in allocated_ids:
+            allocated.append(cand)
+            allocated_ids.add(cand[0])
+            rem_seats -= 1
+
+    waitlist = [cand for cand in ranked if cand[0] not in allocated_ids]
+    return DistrictResult(allocated, waitlist, reserved)
+
+
+# --- WHAT-IF SIMULATION ---
+
+class SchemeSnapshot(NamedTuple):
+    scheme_id: int
+    # district -> ranked candidates
+    districts: Dict[str, Tuple[Candidate, ...]]
+    size: int
+
+
+_snapshots: Dict[int, SchemeSnapshot] = {}
+_generations: Dict[int, int] = {}
+_snapshot_lock = threading.Lock()
+
+
+def invalidate_snapshot(scheme_id: int):
+    with _snapshot_lock:
+        _generations[scheme_id] = _generations.get(scheme_id, 0) + 1
+        _snapshots.pop(scheme_id, None)
+
+
+def get_snapshot(db, scheme_id: int) -> SchemeSnapshot:
+    from app import models
+
+    with _snapshot_lock:
+        cached = _snapshots.get(scheme_id)
+        generation = _generations.get(scheme_id, 0)
+    if cached is not None:
+        return cached
+
+    rows = db.query(
+        models.Application.id,
+        models.Application.impact_score,
+        models.Application.category,
+        models.Application.district,
+    ).filter(
+        models.Application.scheme_id == scheme_id,
+        models.Application.status == models.ApplicationStatus.PENDING
+    ).all()
+
+    by_district: Dict[str, List[Candidate]] = {}
+    for app_id, score, category, district in rows:
+        by_district.setdefault(district, []).append((app_id, score or 0.0, category))
+    snapshot = SchemeSnapshot(
+        scheme_id=scheme_id,
+        districts={d: tuple(rank(c)) for d, c in by_district.items()},
+        size=len(rows),
+    )
+
+    with _snapshot_lock:
+        # Don't cache if an application arrived while we were reading
+        if _generations.get(scheme_id, 0) == generation:
+            _snapshots[scheme_id] = snapshot
+    return snapshot
+
+
+def simulate_scenario(snapshot: SchemeSnapshot, district_quotas: dict, reservations: dict) -> dict:
+    districts = {}
+    total_allocated = 0
+    total_waitlisted = 0
+    for district, total_seats in district_quotas.items():
+        result = allocate_district(snapshot.districts.get(district, ()), total_seats, reservations)
+        merit = result.allocated[sum(result.reserved.values()):]
+        districts[district] = {
+            "seats": total_seats,
+            "applicants": len(result.allocated) + len(result.waitlist),
+            "allocated": len(result.allocated),
+            "reserved": result.reserved,
+            "merit": len(merit),
+            "waitlisted": len(result.waitlist),
+            "cutoff_score": min(c[1] for c in result.allocated) if result.allocated else None,
+            "merit_cutoff_score": merit[-1][1] if merit else None,
+        }
+        total_allocated += len(result.allocated)
+        total_waitlisted += len(result.waitlist)
+    return {
+        "district_quotas": district_quotas,
+        "reservations": reservations,
+        "districts": districts,
+        "total_allocated": total_allocated,
+        "total_waitlisted": total_waitlisted,
+    }
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # One pool per server process, started on first use. Workers come from
+    # forkserver/spawn: a plain fork would copy the server's threads' held locks.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=SIMULATION_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _simulate_chunk(snapshot: SchemeSnapshot, scenarios: List[Tuple[dict, dict]]) -> List[dict]:
+    return [simulate_scenario(snapshot, *scenario) for scenario in scenarios]
+
+
+def simulate(snapshot: SchemeSnapshot, scenarios: List[Tuple[dict, dict]]) -> List[dict]:
+    """Run every (district_quotas, reservations) scenario against one snapshot."""
+    workers = min(SIMULATION_WORKERS, len(scenarios))
+    if workers <= 1 or snapshot.size * len(scenarios) < PARALLEL_THRESHOLD:
+        return _simulate_chunk(snapshot, scenarios)
+
+    # One task per worker, so the snapshot is shipped once per worker; scenarios are tiny
+    size = -(-len(scenarios) // workers)
+    chunks = [scenarios[i:i + size] for i in range(0, len(scenarios), size)]
+    try:
+        results = list(_get_pool().map(_simulate_chunk, [snapshot] * len(chunks), chunks))
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); answer inline and start a fresh pool next time
+        print("SIMULATION POOL BROKEN: running inline")
+        shutdown_pool()
+        return _simulate_chunk(snapshot, scenarios)
+    return [result for chunk in results for result in chunk]
@@ -0,0 +1,166 @@
+"""
+Archival of closed schemes.
+
+A scheme is closed once its allocation is done and its deadline is more than
+ARCHIVE_AFTER_DAYS in the past. archive_closed_schemes moves its applications,
+and the notifications and SMS logs about them, into the archived_* tables in
+bulk, so the hot tables (and every scan over them) only hold active seasons.
+Notifications and SMS logs have no foreign key to their application; they are
+matched on the application ID every such message embeds.
+
+Archived rows are never written again and are read through lookup().
+"""
+import os
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, exists, insert, select
+
+from app import models
+from app.services import allocation, coordination, rolling_allocation
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+BATCH_SIZE = 500
+APPLICATION_ID_PATTERN = re.compile(r"APP-[0-9A-F]{8}")
+
+APPLICATIONS = models.Application.__table__
+NOTIFICATIONS = models.Notification.__table__
+SMS_LOGS = models.SMSLog.__table__
+
+
+def parse_deadline(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def closed_scheme_ids(db, today: Optional[date] = None) -> List[int]:
+    cutoff = (today or date.today()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    closed = []
+    # Schemes archived on an earlier run have no applications left and are skipped
+    for scheme_id, deadline in db.query(models.Scheme.id, models.Scheme.deadline).filter(
+        models.Scheme.allocation_done == True,
+        exists().where(models.Application.scheme_id == models.Scheme.id)
+    ):
+        parsed = parse_deadline(deadline)
+        if parsed is not None and parsed < cutoff:
+            closed.append(scheme_id)
+    return closed
+
+
+def _match_messages(db, table, scheme_of: Dict[str, int]) -> Dict[int, Dict[int, str]]:
+    # One pass over the table: scheme_id -> {row id: application_id}
+    matches: Dict[int, Dict[int, str]] = {}
+    for row_id, message in db.execute(select(table.c.id, table.c.message)):
+        for application_id in APPLICATION_ID_PATTERN.findall(message or ""):
+            scheme_id = scheme_of.get(application_id)
+            if scheme_id is not None:
+                matches.setdefault(scheme_id, {})[row_id] = application_id
+                break
+    return matches
+
+
+def _archive_values(row) -> dict:
+    values = dict(row)
+    values["source_id"] = values.pop("id")
+    return values
+
+
+def _history_row(row) -> dict:
+    # Archived rows read back under their original ids
+    values = dict(row)
+    values.pop("archive_id")
+    values["id"] = values.pop("source_id")
+    return values
+
+
+def _move_messages(db, table, archive_table, application_of: Dict[int, str]) -> int:
+    ids = list(application_of)
+    for i in range(0, len(ids), BATCH_SIZE):
+        batch = ids[i:i + BATCH_SIZE]
+        rows = db.execute(select(table).where(table.c.id.in_(batch))).mappings().all()
+        if rows:
+            db.execute(insert(archive_table), [
+                {**_archive_values(row), "application_id": application_of[row["id"]]} for row in rows
+            ])
+        db.execute(delete(table).where(table.c.id.in_(batch)))
+    return len(ids)
+
+
+def _move_applications(db, scheme_id: int) -> int:
+    columns = ["source_id" if c.name == "id" else c.name for c in APPLICATIONS.columns]
+    source = select(*APPLICATIONS.columns).where(APPLICATIONS.c.scheme_id == scheme_id)
+    db.execute(insert(models.archived_applications).from_select(columns, source))
+    # Duplicate checks never cross schemes, so a closed scheme's fingerprints can go
+    db.execute(delete(models.DocumentFingerprint).where(models.DocumentFingerprint.scheme_id == scheme_id))
+    return db.execute(delete(APPLICATIONS).where(APPLICATIONS.c.scheme_id == scheme_id)).rowcount
+
+
+def archive_closed_schemes(db, today: Optional[date] = None) -> dict:
+    summary = {"schemes": [], "applications": 0, "notifications": 0, "sms_logs": 0}
+    scheme_ids = closed_scheme_ids(db, today)
+    if not scheme_ids:
+        return summary
+
+    scheme_of = dict(db.query(models.Application.application_id, models.Application.scheme_id).filter(
+        models.Application.scheme_id.in_(scheme_ids)
+    ))
+    if not scheme_of:
+        return summary
+    notifications = _match_messages(db, NOTIFICATIONS, scheme_of)
+    sms_logs = _match_messages(db, SMS_LOGS, scheme_of)
+    db.rollback()  # end the read transaction before taking locks
+
+    for scheme_id in scheme_ids:
+        try:
+            with coordination.scheme_lock(db, scheme_id):
+                moved_applications = _move_applications(db, scheme_id)
+                moved_notifications = _move_messages(
+                    db, NOTIFICATIONS, models.archived_notifications, notifications.get(scheme_id, {})
+                )
+                moved_sms_logs = _move_messages(db, SMS_LOGS, models.archived_sms_logs, sms_logs.get(scheme_id, {}))
+                coordination.publish(db, coordination.applications_key(scheme_id))
+                db.commit()
+        except coordination.LockBusy:
+            print(f"ARCHIVE SKIPPED: scheme {scheme_id} is locked")
+            continue
+
+        allocation.invalidate_snapshot(scheme_id)
+        rolling_allocation.invalidate(scheme_id)
+        if moved_applications or moved_notifications or moved_sms_logs:
+            print(f"ARCHIVED scheme {scheme_id}: {moved_applications} applications, "
+                  f"{moved_notifications} notifications, {moved_sms_logs} SMS logs")
+            summary["schemes"].append(scheme_id)
+            summary["applications"] += moved_applications
+            summary["notifications"] += moved_notifications
+            summary["sms_logs"] += moved_sms_logs
+    return summary
+
+
+def lookup(db, application_id: str) -> Optional[dict]:
+    archived = models.archived_applications
+    row = db.execute(select(archived).where(archived.c.application_id == application_id)).mappings().first()
+    if row is None:
+        return None
+
+    application = _history_row(row)
+    archived_at = application.pop("archived_at")
+    scheme = db.query(models.Scheme.title).filter(models.Scheme.id == application["scheme_id"]).first()
+    application["scheme_title"] = scheme.title if scheme else models.DEFAULT_SCHEME_TITLE
+
+    notifications = models.archived_notifications
+    sms_logs = models.archived_sms_logs
+    return {
+        "application": application,
+        "archived_at": archived_at,
+        "notifications": [_history_row(row) for row in db.execute(
+            select(notifications).where(notifications.c.application_id == application_id)
+            .order_by(notifications.c.created_at)
+        ).mappings()],
+        "sms_logs": [_history_row(row) for row in db.execute(
+            select(sms_logs).where(sms_logs.c.application_id == application_id)
+            .order_by(sms_logs.c.sent_at)
+        ).mappings()],
+    }
@@ -0,0 +1,144 @@
+"""
+Response compression for low-bandwidth clients.
+
+Pure ASGI middleware that compresses API responses with brotli when the
+client accepts it and the brotli package is installed, otherwise gzip.
+Small bodies, already-encoded responses, non-text content and excluded
+paths (uploaded documents, already compressed) pass through.
+"""
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MINIMUM_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "512"))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+
+    def ok(name):
+        return accepted.get(name, accepted.get("*", 0.0)) > 0
+
+    if brotli is not None and ok("br"):
+        return "br"
+    if ok("gzip"):
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            # Quality 5 keeps CPU cost close to gzip while still beating it on size
+            self._obj = brotli.Compressor(quality=5)
+            self._finish = self._obj.finish
+        else:
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._finish = self._obj.flush
+
+    def feed(self, data: bytes) -> bytes:
+        return self._obj.process(data) if hasattr(self._obj, "process") else self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE, exclude_prefixes=("/uploads",)):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = dict((k.lower(), v) for k, v in start_message["headers"])
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                # Responses wrapped by BaseHTTPMiddleware arrive in chunks but keep content-length
+                size = int(headers[b"content-length"]) if b"content-length" in headers else (
+                    len(body) if not more_body else self.minimum_size
+                )
+                if (
+                    size < self.minimum_size
+                    or b"content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                new_headers = [
+                    (k, v) for k, v in start_message["headers"]
+                    if k.lower() not in (b"content-length", b"vary", b"etag")
+                ]
+                etag = headers.get(b"etag")
+                if etag:
+                    # The encoded bytes differ from the identity ones, so the tag can only be weak
+                    new_headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+                vary = headers.get(b"vary")
+                new_headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                new_headers.append((b"content-encoding", encoding.encode()))
+                compressor = _Compressor(encoding)
+
+                if not more_body:
+                    compressed = compressor.feed(body) + compressor.finish()
+                    new_headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start_message, "headers": new_headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                # Unknown final size: stream it chunked
+                await send({**start_message, "headers": new_headers})
+
+            chunk = compressor.feed(body)
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,214 @@
+"""
+Coordination between worker processes sharing one database.
+
+Two pieces, both stored in ordinary tables so they work on SQLite and
+Postgres alike:
+
+- scheme_lock: a per-scheme row in allocation_locks claimed with a
+  compare-and-set UPDATE, so only one request in any process allocates a
+  scheme at a time. A holder that dies keeps the lock for at most
+  ALLOCATION_LOCK_TTL seconds.
+- a cache-invalidation bus: with MULTI_WORKER=1, writers bump a row in
+  cache_versions inside their transaction (publish) and a background thread
+  in each worker polls the table every CACHE_BUS_POLL_SECONDS, dropping the
+  matching in-memory caches (scheme catalog, allocation snapshots, rolling
+  allocation state, users) when another worker changed them.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict
+
+from sqlalchemy import event, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import database, models
+from app.services import allocation, rolling_allocation, scheme_cache, user_cache
+
+ENABLED = database.MULTI_WORKER
+POLL_SECONDS = float(os.getenv("CACHE_BUS_POLL_SECONDS", "1.0"))
+LOCK_TTL = float(os.getenv("ALLOCATION_LOCK_TTL", "600"))
+
+SCHEMES = "schemes"
+USERS = "users"
+
+HOLDER_PREFIX = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LockBusy(Exception):
+    pass
+
+
+def applications_key(scheme_id: int) -> str:
+    return f"applications:{scheme_id}"
+
+
+# --- Allocation lock ---
+
+def _acquire(scheme_id: int, holder: str) -> bool:
+    now = time.time()
+    with database.engine.begin() as conn:
+        claimed = conn.execute(
+            update(models.AllocationLock)
+            .where(
+                models.AllocationLock.scheme_id == scheme_id,
+                or_(models.AllocationLock.holder.is_(None), models.AllocationLock.acquired_at < now - LOCK_TTL),
+            )
+            .values(holder=holder, acquired_at=now)
+        ).rowcount
+    if claimed:
+        return True
+    # No row yet (first allocation of this scheme) or someone else holds it
+    try:
+        with database.engine.begin() as conn:
+            conn.execute(insert(models.AllocationLock).values(scheme_id=scheme_id, holder=holder, acquired_at=now))
+        return True
+    except IntegrityError:
+        return False
+
+
+def _release(scheme_id: int, holder: str):
+    try:
+        with database.engine.begin() as conn:
+            conn.execute(
+                update(models.AllocationLock)
+                .where(models.AllocationLock.scheme_id == scheme_id, models.AllocationLock.holder == holder)
+                .values(holder=None, acquired_at=None)
+            )
+    except Exception as e:
+        # The lock expires after LOCK_TTL anyway
+        print(f"ALLOCATION LOCK RELEASE FAILED for scheme {scheme_id}: {e}")
+
+
+@contextmanager
+def scheme_lock(db: Session, scheme_id: int):
+    holder = f"{HOLDER_PREFIX}:{uuid.uuid4().hex[:8]}"
+    if not _acquire(scheme_id, holder):
+        raise LockBusy(scheme_id)
+    try:
+        yield
+    except BaseException:
+        # End the caller's transaction first: on SQLite it holds the write lock the release needs
+        db.rollback()
+        raise
+    finally:
+        _release(scheme_id, holder)
+
+
+# --- Cache-invalidation bus ---
+
+_seen: Dict[str, int] = {}
+_seen_lock = threading.Lock()
+_poller = None
+_stop = threading.Event()
+
+
+def publish(db: Session, *names: str):
+    """Bump the given keys in the caller's transaction. Call right before commit."""
+    if not ENABLED:
+        return
+    published = db.info.setdefault("cache_bus", {})
+    for name in names:
+        bumped = db.execute(
+            update(models.CacheVersion)
+            .where(models.CacheVersion.name == name)
+            .values(version=models.CacheVersion.version + 1)
+        ).rowcount
+        if not bumped:
+            # Rows are created at startup and with each scheme; this only covers stragglers
+            db.execute(insert(models.CacheVersion).values(name=name, version=1))
+        published[name] = db.execute(
+            select(models.CacheVersion.version).where(models.CacheVersion.name == name)
+        ).scalar()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    published = session.info.pop("cache_bus", None)
+    if not published:
+        return
+    with _seen_lock:
+        for name, version in published.items():
+            # Our own change was already applied locally; skip it unless another
+            # worker's change slipped in between, which the poller must still see
+            if _seen.get(name, 0) == version - 1:
+                _seen[name] = version
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("cache_bus", None)
+
+
+def _dispatch(name: str):
+    if name == SCHEMES:
+        scheme_cache.bump_version()
+    elif name == USERS:
+        user_cache.invalidate()
+    elif name.startswith("applications:"):
+        scheme_id = int(name.split(":", 1)[1])
+        allocation.invalidate_snapshot(scheme_id)
+        rolling_allocation.invalidate(scheme_id)
+
+
+def poll(baseline: bool = False):
+    with database.engine.connect() as conn:
+        rows = conn.execute(select(models.CacheVersion.name, models.CacheVersion.version)).all()
+    changed = []
+    with _seen_lock:
+        for name, version in rows:
+            if _seen.get(name, 0) != version:
+                _seen[name] = version
+                changed.append(name)
+    if baseline:
+        return
+    for name in changed:
+        _dispatch(name)
+
+
+def _ensure_rows():
+    with database.engine.connect() as conn:
+        scheme_ids = conn.execute(select(models.Scheme.id)).scalars().all()
+        existing = set(conn.execute(select(models.CacheVersion.name)).scalars())
+    for name in [SCHEMES, USERS] + [applications_key(i) for i in scheme_ids]:
+        if name in existing:
+            continue
+        try:
+            with database.engine.begin() as conn:
+                conn.execute(insert(models.CacheVersion).values(name=name, version=0))
+        except IntegrityError:
+            pass  # another worker starting up created it
+
+
+def _run():
+    while not _stop.wait(POLL_SECONDS):
+        try:
+            poll()
+        except Exception as e:
+            print(f"CACHE BUS POLL FAILED: {e}")
+
+
+def start():
+    global _poller
+    if not ENABLED or _poller is not None:
+        return
+    _ensure_rows()
+    # Caches are empty at startup, so the current versions are the baseline
+    poll(baseline=True)
+    _stop.clear()
+    _poller = threading.Thread(target=_run, name="cache-bus", daemon=True)
+    _poller.start()
+    print(f"CACHE BUS STARTED: polling every {POLL_SECONDS}s")
+
+
+def stop():
+    global _poller
+    if _poller is None:
+        return
+    _stop.set()
+    _poller.join()
+    _poller = None
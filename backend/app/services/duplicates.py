@@ -0,0 +1,284 @@
+"""
+Duplicate-applicant detection.
+
+Two signals, both scoped to one scheme and to different farmer accounts:
+
+- Shared Aadhaar: applications store a keyed hash of the normalized Aadhaar
+  number (aadhaar_hash), indexed together with scheme_id, so finding reuse
+  is an index lookup instead of a self-join on the raw column.
+- Near-duplicate documents: every uploaded image gets a 64-bit difference
+  hash (dHash). Hashes within MAX_DISTANCE bits of each other are treated as
+  the same scan. document_fingerprints stores each hash split into four
+  16-bit bands; with MAX_DISTANCE = 3, two such hashes always agree on at
+  least one band exactly, so candidates come from band lookups and only they
+  are compared bit by bit.
+
+Findings are added to the application's ai_validation_report discrepancies
+and flag it. Uploads check the new documents right away; sweep() checks a
+whole scheme (both sides of every match) before allocation, comparing only
+hashes that share a band bucket.
+"""
+import hashlib
+import hmac
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, or_, select
+
+from app import models
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Its own key, not SECRET_KEY: rotating the token secret must not silently change
+# every new hash so it no longer matches the stored ones
+DEV_AADHAAR_HASH_KEY = "aadhaar-hash-key-for-development-only"
+AADHAAR_HASH_KEY = os.getenv("AADHAAR_HASH_KEY", DEV_AADHAAR_HASH_KEY)
+if AADHAAR_HASH_KEY == DEV_AADHAAR_HASH_KEY and os.getenv("SECRET_KEY"):
+    # A deployment that configures its own secrets must configure this one too
+    raise RuntimeError("AADHAAR_HASH_KEY must be set when SECRET_KEY is; run migrate_applications.py after setting it")
+AADHAAR_HASH_KEY = AADHAAR_HASH_KEY.encode()
+
+MAX_DISTANCE = 3  # must stay below the number of bands
+BANDS = 4
+# Blank or near-uniform pages all hash alike; buckets this large are noise, not fraud
+MAX_BUCKET = 1000
+BATCH_SIZE = 500
+
+FLAGGED = "FLAGGED"
+FIELD_LABELS = {
+    "document_7_12": "7/12 extract",
+    "income_certificate": "Income certificate",
+    "ration_card": "Ration card",
+}
+
+
+def aadhaar_hash(aadhaar_number: Optional[str]) -> Optional[str]:
+    digits = "".join(ch for ch in aadhaar_number or "" if ch.isdigit())
+    if not digits:
+        return None
+    # Keyed, since the 12-digit space is small enough to brute-force a plain hash
+    return hmac.new(AADHAAR_HASH_KEY, digits.encode(), hashlib.sha256).hexdigest()
+
+
+def perceptual_hash(image) -> Optional[str]:
+    # image: the upload as decoded by thumbnails.load_image, None for non-images
+    if image is None:
+        return None
+    small = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left < right)
+    return f"{bits:016x}"
+
+
+def bands(phash: str) -> List[int]:
+    width = 16 // BANDS
+    return [int(phash[i * width:(i + 1) * width], 16) for i in range(BANDS)]
+
+
+def distance(a: str, b: str) -> int:
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+def _band_columns():
+    return [getattr(models.DocumentFingerprint, f"band{i}") for i in range(BANDS)]
+
+
+# --- Upload-time checks ---
+# Plain statements so both the sync and the async upload path can run them
+
+def fingerprints(app_record: models.Application, hashes: Dict[str, Optional[str]]) -> List[models.DocumentFingerprint]:
+    rows = []
+    for field, phash in hashes.items():
+        if phash is None:
+            continue
+        rows.append(models.DocumentFingerprint(
+            application_id=app_record.id,
+            scheme_id=app_record.scheme_id,
+            farmer_id=app_record.farmer_id,
+            field=field,
+            phash=phash,
+            **{f"band{i}": band for i, band in enumerate(bands(phash))}
+        ))
+    return rows
+
+
+def delete_fingerprints(app_record: models.Application, fields: Sequence[str]):
+    # Re-uploaded documents replace their old fingerprints
+    return delete(models.DocumentFingerprint).where(
+        models.DocumentFingerprint.application_id == app_record.id,
+        models.DocumentFingerprint.field.in_(list(fields))
+    )
+
+
+def similar_documents_select(app_record: models.Application, rows: List[models.DocumentFingerprint]):
+    fp = models.DocumentFingerprint
+    band_columns = _band_columns()
+    return select(fp.field, fp.phash, models.Application.application_id).join(
+        models.Application, models.Application.id == fp.application_id
+    ).where(
+        fp.scheme_id == app_record.scheme_id,
+        fp.farmer_id != app_record.farmer_id,
+        or_(*[band_columns[i] == getattr(row, f"band{i}") for row in rows for i in range(BANDS)])
+    )
+
+
+def shared_aadhaar_select(app_record: models.Application):
+    return select(models.Application.application_id).where(
+        models.Application.scheme_id == app_record.scheme_id,
+        models.Application.aadhaar_hash == app_record.aadhaar_hash,
+        models.Application.farmer_id != app_record.farmer_id
+    ).order_by(models.Application.id)
+
+
+def document_finding(field: str, other_application_id: str) -> str:
+    label = FIELD_LABELS.get(field, field)
+    return f"{label} closely matches a document uploaded for {other_application_id} by another farmer account"
+
+
+def aadhaar_finding(other_application_ids: Sequence[str]) -> str:
+    return f"Aadhaar number is also used by other farmer accounts in this scheme: {', '.join(other_application_ids)}"
+
+
+def upload_findings(rows: List[models.DocumentFingerprint], candidates, shared_aadhaar_ids: Sequence[str]) -> List[str]:
+    findings = []
+    for row in rows:
+        for _, phash, other_application_id in candidates:
+            if distance(row.phash, phash) <= MAX_DISTANCE:
+                finding = document_finding(row.field, other_application_id)
+                if finding not in findings:
+                    findings.append(finding)
+    if shared_aadhaar_ids:
+        findings.append(aadhaar_finding(shared_aadhaar_ids))
+    return findings
+
+
+def check_upload(db, app_record: models.Application, hashes: Dict[str, Optional[str]]) -> List[str]:
+    rows = fingerprints(app_record, hashes)
+    candidates, shared_aadhaar_ids = [], []
+    if hashes:
+        db.execute(delete_fingerprints(app_record, list(hashes)))
+        db.add_all(rows)
+    if rows:
+        candidates = db.execute(similar_documents_select(app_record, rows)).all()
+    if app_record.aadhaar_hash:
+        shared_aadhaar_ids = db.execute(shared_aadhaar_select(app_record)).scalars().all()
+    return upload_findings(rows, candidates, shared_aadhaar_ids)
+
+
+async def check_upload_async(db, app_record: models.Application, hashes: Dict[str, Optional[str]]) -> List[str]:
+    # Same as check_upload, for an AsyncSession
+    rows = fingerprints(app_record, hashes)
+    candidates, shared_aadhaar_ids = [], []
+    if hashes:
+        await db.execute(delete_fingerprints(app_record, list(hashes)))
+        db.add_all(rows)
+    if rows:
+        candidates = (await db.execute(similar_documents_select(app_record, rows))).all()
+    if app_record.aadhaar_hash:
+        shared_aadhaar_ids = (await db.execute(shared_aadhaar_select(app_record))).scalars().all()
+    return upload_findings(rows, candidates, shared_aadhaar_ids)
+
+
+def flag(status: str, report: Optional[dict], findings: Sequence[str]) -> Tuple[str, dict]:
+    # Returns a new dict so the JSON column registers the change
+    report = dict(report or {})
+    discrepancies = list(report.get("discrepancies") or [])
+    for finding in findings:
+        if finding not in discrepancies:
+            discrepancies.append(finding)
+    report["discrepancies"] = discrepancies
+    return (FLAGGED if findings else status), report
+
+
+# --- Scheme sweep ---
+
+def _shared_aadhaar_groups(db, scheme_id: int) -> List[List[Tuple[int, str]]]:
+    app = models.Application
+    shared = select(app.aadhaar_hash).where(
+        app.scheme_id == scheme_id, app.aadhaar_hash.isnot(None)
+    ).group_by(app.aadhaar_hash).having(func.count(func.distinct(app.farmer_id)) > 1)
+
+    groups: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+    for pk, application_id, hashed in db.execute(
+        select(app.id, app.application_id, app.aadhaar_hash)
+        .where(app.scheme_id == scheme_id, app.aadhaar_hash.in_(shared))
+        .order_by(app.id)
+    ):
+        groups[hashed].append((pk, application_id))
+    return list(groups.values())
+
+
+def _similar_document_pairs(db, scheme_id: int):
+    fp = models.DocumentFingerprint
+    rows = db.execute(
+        select(fp.application_id.label("pk"), fp.farmer_id, fp.field, fp.phash, models.Application.application_id)
+        .join(models.Application, models.Application.id == fp.application_id)
+        .where(fp.scheme_id == scheme_id)
+    ).all()
+
+    buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for index, row in enumerate(rows):
+        for band, value in enumerate(bands(row.phash)):
+            buckets[(band, value)].append(index)
+
+    pairs = {}
+    skipped = 0
+    for members in buckets.values():
+        if len(members) > MAX_BUCKET:
+            skipped += 1
+            continue
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if rows[a].farmer_id == rows[b].farmer_id or (a, b) in pairs:
+                    continue
+                d = distance(rows[a].phash, rows[b].phash)
+                if d <= MAX_DISTANCE:
+                    pairs[(a, b)] = d
+    return rows, pairs, skipped
+
+
+def sweep(db, scheme_id: int) -> dict:
+    findings: Dict[int, List[str]] = defaultdict(list)
+
+    aadhaar_groups = _shared_aadhaar_groups(db, scheme_id)
+    for group in aadhaar_groups:
+        for pk, application_id in group:
+            findings[pk].append(aadhaar_finding([other for _, other in group if other != application_id]))
+
+    rows, pairs, skipped = _similar_document_pairs(db, scheme_id)
+    similar = []
+    for (a, b), d in pairs.items():
+        first, second = rows[a], rows[b]
+        findings[first.pk].append(document_finding(first.field, second.application_id))
+        findings[second.pk].append(document_finding(second.field, first.application_id))
+        similar.append({
+            "applications": [first.application_id, second.application_id],
+            "documents": [first.field, second.field],
+            "distance": d,
+        })
+
+    pks = list(findings)
+    for i in range(0, len(pks), BATCH_SIZE):
+        for app_record in db.query(models.Application).filter(models.Application.id.in_(pks[i:i + BATCH_SIZE])):
+            app_record.ai_validation_status, app_record.ai_validation_report = flag(
+                app_record.ai_validation_status, app_record.ai_validation_report, findings[app_record.id]
+            )
+    db.commit()
+
+    if skipped:
+        print(f"DUPLICATE SWEEP scheme {scheme_id}: skipped {skipped} oversized hash buckets")
+    return {
+        "scheme_id": scheme_id,
+        "fingerprints_scanned": len(rows),
+        "shared_aadhaar": [[application_id for _, application_id in group] for group in aadhaar_groups],
+        "similar_documents": similar,
+        "flagged_applications": len(pks),
+    }
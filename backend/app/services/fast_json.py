@@ -0,0 +1,62 @@
+"""
+Fast serialization path for large list endpoints.
+
+With FAST_SERIALIZATION=1, list endpoints select plain column tuples (the
+scheme title comes from a join instead of a lazy load per row) and encode
+them with orjson, bypassing ORM object construction and response_model
+validation. The JSON shape is the same as the schemas they replace.
+"""
+import json
+import os
+from typing import Iterable, Sequence
+
+from fastapi.responses import Response
+from sqlalchemy import case, select
+
+from app import models, schemas
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+ENABLED = os.getenv("FAST_SERIALIZATION", "0") == "1"
+
+# Field order follows the response schemas so output matches the slow path
+APPLICATION_FIELDS = tuple(schemas.Application.model_fields)
+SMS_LOG_FIELDS = ("id", "phone_number", "message", "sent_at")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _application_column(name: str):
+    if name == "scheme_title":
+        # Mirrors models.Application.scheme_title
+        return case((models.Scheme.id.is_(None), models.DEFAULT_SCHEME_TITLE), else_=models.Scheme.title)
+    return getattr(models.Application, name)
+
+
+# Plain select() statements so sync and async sessions can both execute them
+def application_select():
+    return select(*[_application_column(name) for name in APPLICATION_FIELDS]).select_from(
+        models.Application
+    ).outerjoin(
+        models.Scheme, models.Scheme.id == models.Application.scheme_id
+    ).order_by(models.Application.id)
+
+
+def sms_log_select():
+    return select(*[getattr(models.SMSLog, name) for name in SMS_LOG_FIELDS])
+
+
+def encode_rows(fields: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    # Enum statuses are str subclasses, both encoders emit their value
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+def rows_response(fields: Sequence[str], rows: Iterable[Sequence]) -> Response:
+    return Response(content=encode_rows(fields, rows), media_type="application/json")
@@ -0,0 +1,207 @@
+"""
+In-process performance metrics.
+
+Keeps per-route latency histograms, per-request DB query counts/time (fed by
+SQLAlchemy cursor events) and a few business counters, rendered in the
+Prometheus text exposition format for the /metrics endpoint.
+"""
+import contextvars
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+# Opt-in slow request log: set SLOW_REQUEST_MS to a threshold in milliseconds
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0") or 0)
+SLOW_REQUEST_LOG = "slow_request_log.txt"
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = []
+    for name, value in zip(labelnames, values):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+))
+REQUEST_DB_QUERIES = REGISTRY.register(Histogram(
+    "http_request_db_queries", "Number of SQL statements issued per request", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS
+))
+REQUEST_DB_TIME = REGISTRY.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL statements per request", ("method", "route")
+))
+DB_QUERIES = REGISTRY.register(Counter("db_queries_total", "SQL statements executed"))
+SMS_SENT = REGISTRY.register(Counter("sms_sent_total", "SMS messages handed to the gateway"))
+AI_VALIDATIONS = REGISTRY.register(Counter("ai_validations_total", "AI document validations run", ("status",)))
+ALLOCATIONS = REGISTRY.register(Counter("allocations_total", "Scheme allocation runs"))
+ALLOCATED_APPLICATIONS = REGISTRY.register(Counter(
+    "allocated_applications_total", "Applications assigned a status by allocation", ("status",)
+))
+
+
+class RequestStats:
+    __slots__ = ("query_count", "db_time", "statements")
+
+    def __init__(self, capture_statements: bool = False):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements: Optional[List[Tuple[str, float]]] = [] if capture_statements else None
+
+
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def start_request() -> Tuple[RequestStats, contextvars.Token]:
+    stats = RequestStats(capture_statements=SLOW_REQUEST_MS > 0)
+    return stats, _current_request.set(stats)
+
+
+def finish_request(stats: RequestStats, token: contextvars.Token, method: str, route: str,
+                   status_code: int, elapsed: float) -> bool:
+    # Returns whether the request should go to the slow request log (log_slow_request)
+    _current_request.reset(token)
+    REQUEST_LATENCY.observe(elapsed, method=method, route=route, status=str(status_code))
+    REQUEST_DB_QUERIES.observe(stats.query_count, method=method, route=route)
+    REQUEST_DB_TIME.observe(stats.db_time, method=method, route=route)
+
+    return SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS
+
+
+def log_slow_request(stats: RequestStats, method: str, route: str, status_code: int, elapsed: float):
+    lines = [
+        f"\n[SLOW REQUEST] {method} {route} -> {status_code} in {elapsed * 1000:.1f}ms "
+        f"({stats.query_count} queries, {stats.db_time * 1000:.1f}ms in DB)"
+    ]
+    for statement, duration in stats.statements or []:
+        lines.append(f"  [{duration * 1000:.2f}ms] {' '.join(statement.split())}")
+    output = "\n".join(lines) + "\n"
+    # Blocking I/O: callers on the event loop run this in a thread
+    print(output)
+
+    with open(SLOW_REQUEST_LOG, "a", encoding="utf-8") as f:
+        f.write(output)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    duration = time.perf_counter() - started
+    DB_QUERIES.inc()
+
+    stats = _current_request.get()
+    if stats is not None:
+        stats.query_count += 1
+        stats.db_time += duration
+        if stats.statements is not None:
+            stats.statements.append((statement, duration))
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def render() -> str:
+    return REGISTRY.render()
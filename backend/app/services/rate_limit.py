@@ -0,0 +1,103 @@
+"""
+In-process token-bucket rate limiting.
+
+Limiters are checked at the top of write endpoints so bursts are shed before
+they reach password hashing or the database. Bucket state lives behind a
+small store interface; InMemoryBucketStore is per process, a shared store
+(Redis, a DB table) can implement the same take() to limit across workers.
+"""
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Tuple
+
+from app.services import metrics
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+
+RATE_LIMITED = metrics.REGISTRY.register(metrics.Counter(
+    "rate_limited_requests_total", "Requests rejected by the rate limiter", ("limiter",)
+))
+
+
+class BucketStore(ABC):
+    @abstractmethod
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """Atomically spend `cost` tokens; returns (allowed, seconds until allowed)."""
+
+    @abstractmethod
+    def refund(self, key: str, capacity: float, cost: float = 1.0):
+        """Give back tokens spent by a request that turned out to cost nothing."""
+
+
+class InMemoryBucketStore(BucketStore):
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time), least recently used first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) / rate
+            self._buckets.move_to_end(key)
+            # Bounded O(1) eviction, so a flood of distinct keys can't make every take() expensive
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def refund(self, key: str, capacity: float, cost: float = 1.0):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                tokens, last = bucket
+                self._buckets[key] = (min(capacity, tokens + cost), last)
+
+
+class TokenBucketLimiter:
+    def __init__(self, name: str, per_minute: float, burst: float, store: BucketStore = None):
+        if per_minute <= 0 or burst <= 0:
+            raise ValueError(f"Rate limit {name} needs a positive rate and burst, use RATE_LIMIT_ENABLED=0 to disable")
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.store = store or InMemoryBucketStore()
+
+    def hit(self, key: str) -> Tuple[bool, float]:
+        if not ENABLED or not key:
+            return True, 0.0
+        allowed, retry_after = self.store.take(f"{self.name}:{key}", self.rate, self.capacity)
+        if not allowed:
+            RATE_LIMITED.inc(limiter=self.name)
+        return allowed, retry_after
+
+    def refund(self, key: str):
+        if not ENABLED or not key:
+            return
+        self.store.refund(f"{self.name}:{key}", self.capacity)
+
+
+def _limit(name: str, per_minute: str, burst: str) -> TokenBucketLimiter:
+    env = name.upper()
+    return TokenBucketLimiter(
+        name,
+        per_minute=float(os.getenv(f"RATE_LIMIT_{env}_PER_MINUTE", per_minute)),
+        burst=float(os.getenv(f"RATE_LIMIT_{env}_BURST", burst)),
+    )
+
+
+# Per-IP limits are loose: many rural users share carrier NAT addresses
+AUTH_BY_IP = _limit("auth_ip", "60", "20")
+AUTH_BY_PHONE = _limit("auth_phone", "6", "5")
+APPLY_BY_IP = _limit("apply_ip", "120", "30")
+APPLY_BY_PHONE = _limit("apply_phone", "10", "5")
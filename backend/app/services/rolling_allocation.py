@@ -0,0 +1,366 @@
+"""
+Incremental ("rolling") allocation.
+
+When INCREMENTAL_ALLOCATION=1, each scheme keeps per district the provisional
+outcome of allocation.allocate_district as applications arrive:
+
+- one min-heap per reserved category holding its current reserved winners,
+- a min-heap of merit winners (worst winner on top, i.e. the cutoff),
+- a max-heap of the waitlist (best waiting candidate on top),
+- per reserved category, a max-heap of its candidates outside the reserved
+  seats, to refill a reserved seat that frees up,
+- a Fenwick tree over scores for O(log n) rank lookups.
+
+Each new application is an O(log n) update, and so is one leaving PENDING
+(rejected during document review): heap entries are deleted lazily, each
+carries a token that goes stale when its candidate moves or leaves, and stale
+entries are skipped when they reach the top. Live rank/cutoff reads come from
+this state and the final allocation only writes it out.
+
+A scheme's state is dropped when its quotas change or another worker changes
+its applications, and rebuilt from the database on next use. The rebuild scan
+runs outside the registry lock, one per scheme; applications added or removed
+meanwhile are replayed onto its result.
+"""
+import heapq
+import itertools
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.allocation import Candidate, RESERVED_CATEGORIES, allocate_district, parse_allocation_config, rank
+
+ENABLED = os.getenv("INCREMENTAL_ALLOCATION", "0") == "1"
+
+WAITLIST = "waitlist"
+MERIT = "merit"
+
+
+class ScoreIndex:
+    """Fenwick tree counting scores at 0.01 resolution."""
+
+    def __init__(self, capacity: int = 1 << 14):
+        self.size = capacity
+        self.tree = [0] * (capacity + 1)
+        self.total = 0
+
+    @staticmethod
+    def _slot(score: float) -> int:
+        return max(0, int(round((score or 0.0) * 100)))
+
+    def _grow(self, slot: int):
+        counts = [self._prefix(i) - self._prefix(i - 1) for i in range(1, self.size + 1)]
+        while self.size <= slot:
+            self.size *= 2
+        self.tree = [0] * (self.size + 1)
+        for i, count in enumerate(counts, start=1):
+            if count:
+                self._update(i, count)
+
+    def _update(self, i: int, delta: int):
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def add(self, score: float):
+        slot = self._slot(score)
+        if slot >= self.size:
+            self._grow(slot)
+        self._update(slot + 1, 1)
+        self.total += 1
+
+    def remove(self, score: float):
+        self._update(min(self._slot(score), self.size - 1) + 1, -1)
+        self.total -= 1
+
+    def count_above(self, score: float) -> int:
+        slot = min(self._slot(score), self.size - 1)
+        return self.total - self._prefix(slot + 1)
+
+
+class DistrictState:
+    def __init__(self, total_seats, reservations: dict):
+        self.total_seats = total_seats
+        self.caps = {cat: int((reservations.get(key, 0) / 100) * total_seats) for cat, key in RESERVED_CATEGORIES}
+        # Heap entries are (sort score, sort id, id, token). Winner heaps hold
+        # (score, -id, ...): the weakest winner sits on top.
+        self.reserved: Dict[str, list] = {cat: [] for cat, _ in RESERVED_CATEGORIES}
+        self.merit: list = []
+        # Waitlist and overflow heaps hold (-score, id, ...): the strongest candidate sits on top
+        self.waitlist: list = []
+        self.overflow: Dict[str, list] = {cat: [] for cat, _ in RESERVED_CATEGORIES}
+        self.candidates: Dict[int, Tuple[float, str]] = {}
+        self.location: Dict[int, str] = {}
+        self.counts: Dict[str, int] = {cat: 0 for cat in [*self.reserved, MERIT, WAITLIST]}
+        # Current token of each candidate's seat entry and overflow entry; any other entry is stale
+        self.tokens: Dict[int, int] = {}
+        self.pool: Dict[int, int] = {}
+        self.scores = ScoreIndex()
+        self._next_token = itertools.count()
+
+    @classmethod
+    def from_ranked(cls, ranked: List[Candidate], total_seats, reservations: dict) -> "DistrictState":
+        state = cls(total_seats, reservations)
+        result = allocate_district(ranked, total_seats, reservations)
+        for app_id, score, category in ranked:
+            state.candidates[app_id] = (score, category)
+            state.scores.add(score)
+        reserved_left = dict(result.reserved)
+        for app_id, _, category in result.allocated:
+            if reserved_left.get(category, 0) > 0:
+                reserved_left[category] -= 1
+                state._place(app_id, category, bulk=True)
+            else:
+                state._place(app_id, MERIT, bulk=True)
+        for app_id, _, _ in result.waitlist:
+            state._place(app_id, WAITLIST, bulk=True)
+        for heap in [*state.reserved.values(), state.merit, state.waitlist, *state.overflow.values()]:
+            heapq.heapify(heap)
+        return state
+
+    def add(self, candidate: Candidate):
+        app_id, score, category = candidate
+        if app_id in self.candidates:
+            return
+        self.candidates[app_id] = (score, category)
+        self.scores.add(score)
+        # Reserved candidates go through their category's heap; _rebalance pushes the weakest out
+        self._place(app_id, category if category in self.reserved else MERIT)
+        self._rebalance()
+
+    def remove(self, app_id: int):
+        candidate = self.candidates.pop(app_id, None)
+        if candidate is None:
+            return
+        self.scores.remove(candidate[0])
+        self._unplace(app_id)
+        self.pool.pop(app_id, None)
+        self._rebalance()
+
+    def _live(self, entry) -> bool:
+        # Tokens are never reused, so only an entry its candidate still holds matches
+        return entry[3] in (self.tokens.get(entry[2]), self.pool.get(entry[2]))
+
+    def _top(self, heap: list):
+        while heap and not self._live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _push(self, heap: list, entry):
+        if len(heap) > 2 * len(self.candidates) + 64:
+            # Mostly stale entries: compact so memory stays proportional to the candidates
+            heap[:] = [e for e in heap if self._live(e)]
+            heapq.heapify(heap)
+        heapq.heappush(heap, entry)
+
+    def _place(self, app_id: int, seat: str, bulk: bool = False):
+        # bulk: append only, the caller heapifies once at the end
+        push = list.append if bulk else self._push
+        score, category = self.candidates[app_id]
+        token = next(self._next_token)
+        self.location[app_id] = seat
+        self.tokens[app_id] = token
+        self.counts[seat] += 1
+        if seat == WAITLIST:
+            push(self.waitlist, (-score, app_id, app_id, token))
+        else:
+            push(self.merit if seat == MERIT else self.reserved[seat], (score, -app_id, app_id, token))
+
+        if seat in self.reserved:
+            self.pool.pop(app_id, None)
+        elif category in self.overflow and app_id not in self.pool:
+            pool_token = next(self._next_token)
+            self.pool[app_id] = pool_token
+            push(self.overflow[category], (-score, app_id, app_id, pool_token))
+
+    def _unplace(self, app_id: int):
+        self.counts[self.location.pop(app_id)] -= 1
+        del self.tokens[app_id]
+
+    def _move(self, app_id: int, seat: str):
+        self._unplace(app_id)
+        self._place(app_id, seat)
+
+    def _rebalance(self):
+        # Same order as allocate_district: each reserved category is capped by
+        # its percentage and by the seats earlier categories left over
+        used = 0
+        for cat, _ in RESERVED_CATEGORIES:
+            limit = max(0, min(self.caps[cat], self.total_seats - used))
+            while self.counts[cat] > limit:
+                self._move(self._top(self.reserved[cat])[2], MERIT)
+            while self.counts[cat] < limit and self._top(self.overflow[cat]):
+                self._move(self._top(self.overflow[cat])[2], cat)
+            used += self.counts[cat]
+
+        merit_seats = max(0, self.total_seats - used)
+        while self.counts[MERIT] > merit_seats:
+            self._move(self._top(self.merit)[2], WAITLIST)
+        while self.counts[MERIT] < merit_seats and self._top(self.waitlist):
+            self._move(self._top(self.waitlist)[2], MERIT)
+
+    def winner_ids(self) -> List[int]:
+        return [e[2] for heap in [*self.reserved.values(), self.merit] for e in heap if self._live(e)]
+
+    def waitlist_ids(self) -> List[int]:
+        return [e[2] for e in self.waitlist if self._live(e)]
+
+    def cutoff_score(self) -> Optional[float]:
+        tops = [self._top(heap) for heap in [*self.reserved.values(), self.merit]]
+        return min((top[0] for top in tops if top), default=None)
+
+    def summary(self) -> dict:
+        merit_top = self._top(self.merit)
+        return {
+            "seats": self.total_seats,
+            "applicants": len(self.location),
+            "provisional_winners": sum(self.counts[cat] for cat in self.reserved) + self.counts[MERIT],
+            "reserved": {cat: self.counts[cat] for cat in self.reserved},
+            "waitlisted": self.counts[WAITLIST],
+            "cutoff_score": self.cutoff_score(),
+            "merit_cutoff_score": merit_top[0] if merit_top else None,
+        }
+
+    def position(self, app_id: int, score: float) -> Optional[dict]:
+        location = self.location.get(app_id)
+        if location is None:
+            # Not part of this state, which is stale; the caller rebuilds it
+            return None
+        return {
+            "provisional_status": "waiting" if location == WAITLIST else "provisionally_approved",
+            "seat_type": location if location != WAITLIST else None,
+            "district_rank": self.scores.count_above(score) + 1,
+            "district_applicants": len(self.location),
+            **self.summary(),
+        }
+
+
+class SchemeState:
+    def __init__(self, scheme_id: int, config: Tuple[str, str], districts: Dict[str, DistrictState]):
+        self.scheme_id = scheme_id
+        self.config = config
+        self.districts = districts
+        self.lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return sum(len(d.location) for d in self.districts.values())
+
+
+class _Build:
+    """A rebuild scan in flight; other readers of the scheme wait for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        # (district, change) from add/remove calls made during the scan, replayed onto its result
+        self.changes: List[Tuple[str, Callable[[DistrictState], None]]] = []
+        self.cancelled = False
+
+
+_states: Dict[int, SchemeState] = {}
+_builds: Dict[int, _Build] = {}
+_states_lock = threading.Lock()
+
+
+def _config_key(scheme) -> Tuple[str, str]:
+    return (scheme.district_quotas or "", scheme.reservations or "")
+
+
+def _build(db, scheme) -> SchemeState:
+    from app import models
+
+    district_quotas, reservations = parse_allocation_config(scheme)
+    rows = db.query(
+        models.Application.id,
+        models.Application.impact_score,
+        models.Application.category,
+        models.Application.district,
+    ).filter(
+        models.Application.scheme_id == scheme.id,
+        models.Application.status == models.ApplicationStatus.PENDING
+    ).all()
+
+    by_district: Dict[str, List[Candidate]] = {d: [] for d in district_quotas}
+    for app_id, score, category, district in rows:
+        if district in by_district:
+            by_district[district].append((app_id, score or 0.0, category))
+    districts = {
+        d: DistrictState.from_ranked(rank(cands), district_quotas[d], reservations)
+        for d, cands in by_district.items()
+    }
+    return SchemeState(scheme.id, _config_key(scheme), districts)
+
+
+def get_state(db, scheme) -> SchemeState:
+    config = _config_key(scheme)
+    while True:
+        with _states_lock:
+            state = _states.get(scheme.id)
+            if state is not None and state.config == config:
+                return state
+            build = _builds.get(scheme.id)
+            if build is None:
+                # From here on changes queue up on the build instead of a stale state
+                _states.pop(scheme.id, None)
+                build = _builds[scheme.id] = _Build()
+                break
+        # Someone is already scanning this scheme; use their result rather than scan too
+        build.done.wait()
+
+    # Scan without the registry lock, so applies and reads for other schemes go on meanwhile
+    try:
+        state = _build(db, scheme)
+        with _states_lock:
+            if not build.cancelled:
+                # Changes may already be in the scan; add and remove both ignore repeats
+                for district, change in build.changes:
+                    district_state = state.districts.get(district)
+                    if district_state is not None:
+                        change(district_state)
+                _states[scheme.id] = state
+        return state
+    finally:
+        with _states_lock:
+            _builds.pop(scheme.id, None)
+        build.done.set()
+
+
+def _update(scheme_id: int, district: str, change: Callable[[DistrictState], None]):
+    # Only maintain state that exists or is being built; otherwise the next read builds it
+    with _states_lock:
+        state = _states.get(scheme_id)
+        if state is None:
+            build = _builds.get(scheme_id)
+            if build is not None:
+                build.changes.append((district, change))
+            return
+    district_state = state.districts.get(district)
+    if district_state is None:
+        return
+    with state.lock:
+        change(district_state)
+
+
+def add_application(scheme_id: int, app_id: int, score: float, category: str, district: str):
+    _update(scheme_id, district, lambda d: d.add((app_id, score or 0.0, category)))
+
+
+def remove_application(scheme_id: int, app_id: int, district: str):
+    # The application left PENDING (rejected, approved directly, ...)
+    _update(scheme_id, district, lambda d: d.remove(app_id))
+
+
+def invalidate(scheme_id: int):
+    with _states_lock:
+        _states.pop(scheme_id, None)
+        build = _builds.get(scheme_id)
+        if build is not None:
+            # Its scan may predate the change: let it finish, but don't keep the result
+            build.cancelled = True
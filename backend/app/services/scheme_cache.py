@@ -0,0 +1,114 @@
+"""
+Pre-serialized scheme catalog.
+
+Schemes change only through create_scheme and allocation, so the catalog is
+rendered to JSON bytes once per version and served from memory (with an
+ETag) until a write bumps the version. Reads in the common case touch
+neither the database nor Pydantic.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import List, NamedTuple, Optional
+
+from app import models, schemas
+
+MAX_AGE = int(os.getenv("SCHEME_CACHE_MAX_AGE", "0"))
+CATALOG_CACHE_CONTROL = f"public, max-age={MAX_AGE}, must-revalidate"
+# Eligibility results depend on the request body, so only the client may keep them
+ELIGIBLE_CACHE_CONTROL = "private, no-cache"
+
+
+class CachedScheme(NamedTuple):
+    max_income: Optional[int]
+    max_land_size: Optional[float]
+    district_quotas: Optional[dict]
+    body: bytes
+
+
+class Catalog(NamedTuple):
+    version: int
+    etag: str
+    body: bytes
+    schemes: List[CachedScheme]
+
+
+_version = 0
+_catalog: Optional[Catalog] = None
+_lock = threading.Lock()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def bump_version():
+    global _version
+    with _lock:
+        _version += 1
+
+
+def _parse_quotas(raw) -> Optional[dict]:
+    quotas = raw
+    if quotas and isinstance(quotas, str):
+        try:
+            quotas = json.loads(quotas)
+        except Exception:
+            pass
+    return quotas if quotas and isinstance(quotas, dict) else None
+
+
+def _build(db, version: int) -> Catalog:
+    cached = []
+    for s in db.query(models.Scheme).all():
+        body = schemas.Scheme.model_validate(s).model_dump_json().encode()
+        cached.append(CachedScheme(s.max_income, s.max_land_size, _parse_quotas(s.district_quotas), body))
+    body = b"[" + b",".join(c.body for c in cached) + b"]"
+    return Catalog(version, make_etag(body), body, cached)
+
+
+def get_catalog(db) -> Catalog:
+    global _catalog
+    catalog = _catalog
+    version = _version
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    catalog = _build(db, version)
+    with _lock:
+        # Only publish if no write happened while we were building
+        if _version == version:
+            _catalog = catalog
+    return catalog
+
+
+def eligible_body(catalog: Catalog, check: schemas.EligibilityCheck) -> bytes:
+    selected = []
+    for s in catalog.schemes:
+        # Check income (if specified)
+        if s.max_income is not None and check.income > s.max_income:
+            continue
+        # Check land size (if specified)
+        if s.max_land_size is not None and check.land_size > s.max_land_size:
+            continue
+        # Check district (if specified in quotas)
+        if s.district_quotas is not None and check.district not in s.district_quotas:
+            continue
+        selected.append(s.body)
+    return b"[" + b",".join(selected) + b"]"
@@ -1,3 +1,5 @@
+from app.services import metrics
+
 def send_sms(phone_number: str, message: str):
     """
     Mock SMS Service. 
@@ -8,5 +10,6 @@ def send_sms(phone_number: str, message: str):
     # Persistent log for verification
     with open("sms_log.txt", "a", encoding="utf-8") as f:
         f.write(gsm_output)
-        
+
+    metrics.SMS_SENT.inc()
     return True
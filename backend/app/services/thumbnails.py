@@ -0,0 +1,68 @@
+"""
+Downscaled derivatives of uploaded document scans.
+
+For every uploaded image a screen-sized preview and a small thumbnail are
+written next to it at upload time, so review screens can show them first and
+fetch the full-resolution original only on demand. Derivative names embed a
+content hash, which lets them be served as immutable. Non-image uploads (e.g.
+PDFs) and installs without Pillow simply get no derivatives.
+"""
+import hashlib
+import os
+from typing import Dict, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+PREVIEW_SIZE = (1280, 1280)
+THUMBNAIL_SIZE = (256, 256)
+DERIVED_DIR = "derived"
+
+ORIGINAL_CACHE_CONTROL = "private, max-age=3600"
+DERIVED_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def is_derived(path: str) -> bool:
+    return f"/{DERIVED_DIR}/" in path.replace(os.sep, "/")
+
+
+def _save(image, path: str, size, quality: int):
+    copy = image.copy()
+    copy.thumbnail(size)
+    copy.save(path, "JPEG", quality=quality, optimize=True, progressive=True)
+
+
+def load_image(path: str):
+    """Decode an upload once for everything derived from it; None if Pillow can't read it."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            # Let the JPEG decoder downscale while decoding instead of loading full resolution
+            image.draft("RGB", PREVIEW_SIZE)
+            return ImageOps.exif_transpose(image).convert("RGB")
+    except Exception:
+        # Not an image Pillow can read (PDF and friends)
+        return None
+
+
+def make_derivatives(path: str, image) -> Optional[Dict[str, str]]:
+    # image: the upload at path, as returned by load_image
+    if image is None:
+        return None
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+
+    directory, filename = os.path.split(path)
+    derived_dir = os.path.join(directory, DERIVED_DIR)
+    os.makedirs(derived_dir, exist_ok=True)
+    stem = os.path.splitext(filename)[0]
+
+    preview = f"{derived_dir}/{stem}_{digest}_preview.jpg"
+    thumbnail = f"{derived_dir}/{stem}_{digest}_thumb.jpg"
+    _save(image, preview, PREVIEW_SIZE, quality=70)
+    _save(image, thumbnail, THUMBNAIL_SIZE, quality=60)
+    return {"preview": preview, "thumbnail": thumbnail}
@@ -0,0 +1,55 @@
+"""
+Per-process cache of authenticated users.
+
+Every authenticated request resolves the token's phone number to a user. The
+cache keeps the few columns handlers read, so the common case skips that
+query. Entries expire after USER_CACHE_TTL seconds; in multi-worker mode a
+change published on the "users" key clears the cache on every worker.
+"""
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from app import models
+
+TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+MAX_ENTRIES = 10000
+
+
+class CachedUser(NamedTuple):
+    id: int
+    full_name: str
+    phone_number: str
+    role: models.UserRole
+    expires_at: float
+
+
+_users: Dict[str, CachedUser] = {}
+_lock = threading.Lock()
+
+
+def get(phone_number: str) -> Optional[models.User]:
+    cached = _users.get(phone_number)
+    if cached is None or cached.expires_at < time.monotonic():
+        return None
+    # A fresh detached instance per request, so handlers can't share mutations
+    return models.User(
+        id=cached.id, full_name=cached.full_name, phone_number=cached.phone_number, role=cached.role
+    )
+
+
+def put(user: models.User):
+    entry = CachedUser(user.id, user.full_name, user.phone_number, user.role, time.monotonic() + TTL)
+    with _lock:
+        if len(_users) >= MAX_ENTRIES:
+            _users.clear()
+        _users[user.phone_number] = entry
+
+
+def invalidate(phone_number: Optional[str] = None):
+    with _lock:
+        if phone_number is None:
+            _users.clear()
+        else:
+            _users.pop(phone_number, None)
@@ -0,0 +1,21 @@
+import os
+import sys
+
+# Add the current directory to sys.path to import app modules
+sys.path.append(os.getcwd())
+
+from app import models
+from app.database import SessionLocal, engine
+from app.services import archive
+
+# Moves applications, notifications and SMS logs of closed schemes into the
+# archive tables. Safe to run from cron while the API is up.
+if __name__ == "__main__":
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        summary = archive.archive_closed_schemes(db)
+        print(f"Archived {len(summary['schemes'])} schemes: {summary['applications']} applications, "
+              f"{summary['notifications']} notifications, {summary['sms_logs']} SMS logs")
+    finally:
+        db.close()
@@ -0,0 +1,59 @@
+"""
+Compare two benchmark result files produced by benchmarks.run.
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Exits non-zero when any benchmark's mean got slower by more than the
+threshold percentage.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    rows = []
+    regressions = []
+    for name, new in candidate["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            rows.append((name, None, new["mean_ms"], None))
+            continue
+        change = (new["mean_ms"] - old["mean_ms"]) / old["mean_ms"] * 100 if old["mean_ms"] else 0.0
+        rows.append((name, old["mean_ms"], new["mean_ms"], change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare benchmark runs")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="allowed slowdown in percent before flagging a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline["meta"].get("dataset") != candidate["meta"].get("dataset"):
+        print("WARNING: runs used different datasets, numbers are not directly comparable")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    for name, old, new, change in rows:
+        if old is None:
+            print(f"{name:32s} {'-':>12s} -> {new:10.3f}ms  (new)")
+        else:
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"{name:32s} {old:10.3f}ms -> {new:10.3f}ms  {change:+7.1f}%{flag}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
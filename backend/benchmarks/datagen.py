@@ -0,0 +1,122 @@
+"""
+Synthetic data generator for the benchmark suite.
+
+Bulk-inserts farmers, schemes and applications straight through SQLAlchemy
+Core so that 1M-row databases can be built in reasonable time. Import only
+after benchmarks.run has pointed DATABASE_URL at the scratch database.
+"""
+import json
+import random
+
+from app import auth, models
+from app.main import calculate_impact_score
+
+DISTRICTS = [
+    "Pune", "Nagpur", "Nashik", "Aurangabad", "Solapur", "Kolhapur",
+    "Amravati", "Satara", "Sangli", "Jalgaon", "Ahmednagar", "Latur",
+]
+CATEGORIES = ["General"] * 6 + ["SC"] * 2 + ["ST"] + ["OBC"]
+FARMER_PASSWORD = "bench-password"
+ADMIN_PHONE = "9000000000"
+CHUNK_SIZE = 10000
+
+
+def _insert_chunked(conn, table, rows_iter):
+    chunk = []
+    for row in rows_iter:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            conn.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        conn.execute(table.insert(), chunk)
+
+
+def farmer_phone(index: int) -> str:
+    return f"8{index:09d}"
+
+
+def generate(engine, farmers: int, applications: int, schemes: int, seed: int = 42) -> dict:
+    """Populate an empty database and return a summary of what was created."""
+    if applications > farmers * schemes:
+        raise ValueError("applications must not exceed farmers * schemes")
+
+    rng = random.Random(seed)
+    models.Base.metadata.create_all(bind=engine)
+
+    # Hashing is deliberately slow, so every synthetic farmer shares one hash
+    hashed = auth.get_password_hash(FARMER_PASSWORD)
+    per_scheme = max(1, applications // schemes)
+    per_district = max(1, per_scheme // len(DISTRICTS))
+
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [{
+            "full_name": "Bench Admin",
+            "phone_number": ADMIN_PHONE,
+            "hashed_password": hashed,
+            "role": models.UserRole.ADMIN,
+        }])
+        _insert_chunked(conn, models.User.__table__, ({
+            "full_name": f"Farmer {i}",
+            "phone_number": farmer_phone(i),
+            "hashed_password": hashed,
+            "role": models.UserRole.FARMER,
+        } for i in range(farmers)))
+
+        # Scheme 1 is kept empty for end-to-end /apply runs
+        scheme_rows = []
+        for s in range(schemes + 1):
+            scheme_rows.append({
+                "title": f"Bench Scheme {s}",
+                "description": "Synthetic scheme",
+                "eligibility_criteria": "Synthetic",
+                "required_documents": "7/12, Income",
+                "total_quota": per_district * len(DISTRICTS) // 2,
+                "max_income": rng.choice([None, 100000, 150000, 200000]),
+                "max_land_size": rng.choice([None, 2.0, 3.0, 5.0]),
+                "deadline": "2026-12-31",
+                "allocation_done": False,
+                "district_quotas": json.dumps({d: max(1, per_district // 2) for d in DISTRICTS}),
+                "reservations": json.dumps({"scPercentage": 15, "stPercentage": 7.5}),
+            })
+        conn.execute(models.Scheme.__table__.insert(), scheme_rows)
+
+        first_farmer_id = conn.execute(
+            models.User.__table__.select().with_only_columns(models.User.id)
+            .where(models.User.phone_number == farmer_phone(0))
+        ).scalar()
+
+        def application_rows():
+            for i in range(applications):
+                farmer = i % farmers
+                # Rotate schemes per farmer so (farmer, scheme) pairs never repeat
+                scheme = 2 + (farmer + i // farmers) % schemes
+                income = rng.randint(10000, 300000)
+                land_size = round(rng.uniform(0.2, 8.0), 2)
+                category = rng.choice(CATEGORIES)
+                yield {
+                    "application_id": f"APP-{i:08X}",
+                    "farmer_id": first_farmer_id + farmer,
+                    "scheme_id": scheme,
+                    "status": models.ApplicationStatus.PENDING,
+                    "applicant_name": f"Farmer {farmer}",
+                    "aadhaar_number": f"{rng.randint(0, 10**12 - 1):012d}",
+                    "income": income,
+                    "land_size": land_size,
+                    "district": rng.choice(DISTRICTS),
+                    "category": category,
+                    "impact_score": calculate_impact_score(income, land_size, category),
+                    "ai_validation_status": "PENDING",
+                }
+
+        _insert_chunked(conn, models.Application.__table__, application_rows())
+
+    return {
+        "farmers": farmers,
+        "applications": applications,
+        "schemes": schemes,
+        "empty_scheme_id": 1,
+        "first_farmer_id": first_farmer_id,
+        "seed": seed,
+    }
+
@@ -0,0 +1,321 @@
+"""
+Backend benchmark suite.
+
+Builds a scratch SQLite database of synthetic farmers, schemes and
+applications, micro-benchmarks the hot helpers and endpoint functions, then
+drives the FastAPI app in-process for end-to-end throughput. Results are
+written as JSON so runs can be diffed with benchmarks.compare.
+
+Usage (from backend/):
+    python -m benchmarks.run --scale 10k --output bench_10k.json
+    python -m benchmarks.run --scale 1M --workdir /tmp/bench-1m   # later runs restore the generated DB
+    python -m benchmarks.compare baseline.json bench_10k.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_FILE = "bench.db"
+# Untouched copy of the generated data; runs mutate DB_FILE, so it is restored from this each time
+PRISTINE_FILE = "bench_pristine.db"
+META_FILE = "bench_meta.json"
+
+
+def parse_scale(value: str) -> int:
+    value = value.strip().lower()
+    multiplier = 1
+    if value.endswith("k"):
+        multiplier, value = 1000, value[:-1]
+    elif value.endswith("m"):
+        multiplier, value = 1000000, value[:-1]
+    return int(float(value) * multiplier)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kisansahay backend benchmarks")
+    parser.add_argument("--scale", type=parse_scale, default=parse_scale("10k"),
+                        help="number of applications to generate, e.g. 10k, 100k, 1M")
+    parser.add_argument("--farmers", type=parse_scale, default=None,
+                        help="number of farmers (defaults to --scale)")
+    parser.add_argument("--schemes", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default=None,
+                        help="scratch directory; the database generated there is reused by later runs")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="iterations for micro-benchmarks")
+    parser.add_argument("--allocation-iterations", type=int, default=5,
+                        help="iterations for whole-scheme and whole-list benchmarks")
+    parser.add_argument("--serialize-rows", type=parse_scale, default=parse_scale("5k"),
+                        help="rows per list serialization benchmark")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per end-to-end endpoint")
+    parser.add_argument("--admin-requests", type=int, default=5,
+                        help="requests for /admin/applications, which returns every row")
+    return parser.parse_args(argv)
+
+
+def summarize(samples, batch: int = 1) -> dict:
+    per_op = sorted(s / batch for s in samples)
+    mean = statistics.fmean(per_op)
+    return {
+        "n": len(per_op) * batch,
+        "mean_ms": mean * 1000,
+        "p50_ms": per_op[len(per_op) // 2] * 1000,
+        "p95_ms": per_op[min(len(per_op) - 1, int(len(per_op) * 0.95))] * 1000,
+        "min_ms": per_op[0] * 1000,
+        "max_ms": per_op[-1] * 1000,
+        "ops_per_sec": 1 / mean if mean else None,
+    }
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def prepare_database(args, workdir):
+    meta_path = os.path.join(workdir, META_FILE)
+    db_path = os.path.join(workdir, DB_FILE)
+    pristine_path = os.path.join(workdir, PRISTINE_FILE)
+    wanted = {
+        "farmers": args.farmers or args.scale,
+        "applications": args.scale,
+        "schemes": args.schemes,
+        "seed": args.seed,
+    }
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if not all(meta.get(k) == v for k, v in wanted.items()):
+            raise SystemExit(f"{workdir} holds a database generated with different parameters")
+        if os.path.exists(pristine_path):
+            # Called before anything imports app.database, so the file isn't open yet
+            shutil.copyfile(pristine_path, db_path)
+            return meta, 0.0
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    from benchmarks import datagen
+    from app.database import engine
+
+    started = time.perf_counter()
+    meta = datagen.generate(engine, wanted["farmers"], wanted["applications"], wanted["schemes"], args.seed)
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    shutil.copyfile(db_path, pristine_path)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return meta, elapsed
+
+
+def run_micro(args, meta, results):
+    from fastapi.encoders import jsonable_encoder
+    from starlette.requests import Request
+    from app.services import fast_json
+    from app import main, models, schemas
+    from app.database import SessionLocal
+    from benchmarks import datagen
+
+    rng = random.Random(args.seed)
+
+    # calculate_impact_score: batched, it is far below timer resolution per call
+    batch = 1000
+    inputs = [
+        (rng.randint(0, 300000), rng.uniform(0, 8), rng.choice(datagen.CATEGORIES))
+        for _ in range(batch)
+    ]
+    score = main.calculate_impact_score
+    samples = [timed(lambda: [score(*i) for i in inputs]) for _ in range(args.iterations)]
+    results["calculate_impact_score"] = summarize(samples, batch)
+
+    db = SessionLocal()
+    try:
+        admin = db.query(models.User).filter(models.User.phone_number == datagen.ADMIN_PHONE).first()
+
+        checks = [
+            schemas.EligibilityCheck(
+                income=rng.randint(0, 300000),
+                land_size=rng.uniform(0, 8),
+                district=rng.choice(datagen.DISTRICTS),
+                category=rng.choice(datagen.CATEGORIES),
+            )
+            for _ in range(args.iterations)
+        ]
+        request = Request({"type": "http", "method": "POST", "headers": []})
+        samples = [timed(lambda: main.get_eligible_schemes(c, request, db)) for c in checks]
+        results["get_eligible_schemes"] = summarize(samples)
+
+        # trigger_allocation locks the scheme, so reset it between runs (untimed)
+        scheme_id = meta["empty_scheme_id"] + 1
+        samples = []
+        for _ in range(args.allocation_iterations):
+            db.query(models.Application).filter(models.Application.scheme_id == scheme_id).update(
+                {models.Application.status: models.ApplicationStatus.PENDING}
+            )
+            db.query(models.Scheme).filter(models.Scheme.id == scheme_id).update(
+                {models.Scheme.allocation_done: False}
+            )
+            db.commit()
+            db.expire_all()
+            samples.append(timed(lambda: main.trigger_allocation(scheme_id, admin, db)))
+        results["trigger_allocation"] = summarize(samples)
+
+        # Waitlist promotion: reject provisional winners of the allocated scheme
+        winners = [
+            row.application_id for row in db.query(models.Application.application_id).filter(
+                models.Application.scheme_id == scheme_id,
+                models.Application.status == models.ApplicationStatus.PROVISIONALLY_APPROVED,
+            ).limit(args.iterations)
+        ]
+        samples = [
+            timed(lambda: main.update_application_status(
+                application_id, models.ApplicationStatus.REJECTED, admin, db
+            ))
+            for application_id in winners
+        ]
+        if samples:
+            results["waitlist_promotion"] = summarize(samples)
+        # List serialization, per row: ORM objects through response_model
+        # validation vs column tuples encoded directly
+        rows = min(args.serialize_rows, meta["applications"])
+        samples = []
+        for _ in range(args.allocation_iterations):
+            db.expunge_all()
+            samples.append(timed(lambda: json.dumps(jsonable_encoder([
+                schemas.Application.model_validate(a)
+                for a in db.query(models.Application).limit(rows)
+            ]))))
+        results["serialize_applications_orm_per_row"] = summarize(samples, rows)
+        samples = [
+            timed(lambda: fast_json.encode_rows(
+                fast_json.APPLICATION_FIELDS, db.execute(fast_json.application_select().limit(rows))
+            ))
+            for _ in range(args.allocation_iterations)
+        ]
+        results["serialize_applications_fast_per_row"] = summarize(samples, rows)
+    finally:
+        db.close()
+
+
+def run_end_to_end(args, meta, results):
+    from fastapi.testclient import TestClient
+    from app import auth
+    from app.main import app
+    from benchmarks import datagen
+
+    client = TestClient(app)
+    requests = min(args.requests, meta["farmers"])
+
+    def endpoint(name, count, send):
+        samples = []
+        for i in range(count):
+            started = time.perf_counter()
+            response = send(i)
+            samples.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name} returned {response.status_code}: {response.text[:200]}")
+        results[name] = summarize(samples)
+
+    def farmer_headers(i):
+        token = auth.create_access_token(data={"sub": datagen.farmer_phone(i)})
+        return {"Authorization": f"Bearer {token}"}
+
+    endpoint("POST /token", requests, lambda i: client.post(
+        "/token", data={"username": datagen.farmer_phone(i), "password": datagen.FARMER_PASSWORD}
+    ))
+
+    farmer_tokens = [farmer_headers(i) for i in range(requests)]
+    scheme_id = meta["empty_scheme_id"]
+    endpoint("POST /apply/{scheme_id}", requests, lambda i: client.post(
+        f"/apply/{scheme_id}",
+        headers=farmer_tokens[i],
+        json={
+            "scheme_id": scheme_id,
+            "applicant_name": f"Farmer {i}",
+            "aadhaar_number": f"{i:012d}",
+            "income": 50000 + i,
+            "land_size": 1.5,
+            "district": datagen.DISTRICTS[i % len(datagen.DISTRICTS)],
+            "category": datagen.CATEGORIES[i % len(datagen.CATEGORIES)],
+        },
+    ))
+
+    endpoint("GET /farmer/dashboard", requests, lambda i: client.get(
+        "/farmer/dashboard", headers=farmer_tokens[i]
+    ))
+
+    admin_token = auth.create_access_token(data={"sub": datagen.ADMIN_PHONE})
+    endpoint("GET /admin/applications", args.admin_requests, lambda i: client.get(
+        "/admin/applications", headers={"Authorization": f"Bearer {admin_token}"}
+    ))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output)
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="kisansahay-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    # Must happen before anything imports app.database
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, DB_FILE)}"
+    # Every in-process request comes from one client address
+    os.environ["RATE_LIMIT_ENABLED"] = "0"
+    sys.path.insert(0, BACKEND_DIR)
+    # uploads/, sms_log.txt and friends land in the scratch directory
+    os.chdir(workdir)
+
+    results = {}
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            meta, generation_seconds = prepare_database(args, workdir)
+            run_micro(args, meta, results)
+            run_end_to_end(args, meta, results)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    import sqlalchemy
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "dataset": meta,
+            "generation_seconds": generation_seconds,
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results.items():
+        print(f"{name:32s} mean {stats['mean_ms']:10.3f}ms  p95 {stats['p95_ms']:10.3f}ms  n={stats['n']}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import sqlite3
+import os
+import sys
+
+# Add the current directory to sys.path to import app modules
+sys.path.append(os.getcwd())
+
+from app.services.duplicates import aadhaar_hash
+
+db_path = 'farmer_support.db'
+if os.path.exists(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(applications)")
+    columns = [row[1] for row in cursor.fetchall()]
+
+    if 'idempotency_key' not in columns:
+        print("Adding idempotency_key column...")
+        cursor.execute("ALTER TABLE applications ADD COLUMN idempotency_key VARCHAR")
+
+    if 'document_previews' not in columns:
+        print("Adding document_previews column...")
+        cursor.execute("ALTER TABLE applications ADD COLUMN document_previews JSON")
+
+    if 'aadhaar_hash' not in columns:
+        print("Adding aadhaar_hash column...")
+        cursor.execute("ALTER TABLE applications ADD COLUMN aadhaar_hash VARCHAR")
+
+    # Also re-hashes rows hashed under an earlier key (AADHAAR_HASH_KEY used to default to SECRET_KEY)
+    cursor.execute("SELECT id, aadhaar_number, aadhaar_hash FROM applications WHERE aadhaar_number IS NOT NULL")
+    stale = []
+    for app_id, number, hashed in cursor.fetchall():
+        current = aadhaar_hash(number)
+        if current != hashed:
+            stale.append((current, app_id))
+    if stale:
+        print(f"Hashing {len(stale)} Aadhaar numbers...")
+        cursor.executemany("UPDATE applications SET aadhaar_hash = ? WHERE id = ?", stale)
+
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS ix_applications_scheme_aadhaar_hash
+    ON applications (scheme_id, aadhaar_hash)
+    """)
+
+    # Archive rows mirror the applications columns
+    cursor.execute("PRAGMA table_info(archived_applications)")
+    archived_columns = [row[1] for row in cursor.fetchall()]
+    if archived_columns and 'aadhaar_hash' not in archived_columns:
+        print("Adding aadhaar_hash column to archived_applications...")
+        cursor.execute("ALTER TABLE archived_applications ADD COLUMN aadhaar_hash VARCHAR")
+
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS ix_applications_farmer_idempotency_key
+    ON applications (farmer_id, idempotency_key)
+    """)
+
+    # The unique (farmer_id, scheme_id) index can only be built once duplicates are resolved
+    cursor.execute("""
+    SELECT farmer_id, scheme_id, COUNT(*) FROM applications
+    GROUP BY farmer_id, scheme_id HAVING COUNT(*) > 1
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        print(f"Found {len(duplicates)} duplicate (farmer_id, scheme_id) pairs, resolve them and re-run:")
+        for farmer_id, scheme_id, count in duplicates:
+            print(f"  farmer {farmer_id}, scheme {scheme_id}: {count} applications")
+    else:
+        print("Adding unique (farmer_id, scheme_id) index...")
+        cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_applications_farmer_scheme
+        ON applications (farmer_id, scheme_id)
+        """)
+
+    conn.commit()
+    conn.close()
+    print("Applications table migrated successfully.")
+else:
+    print("Database file not found.")
@@ -0,0 +1,50 @@
+import sqlite3
+import os
+import sys
+
+# Add the current directory to sys.path to import app modules
+sys.path.append(os.getcwd())
+
+from app import models
+from app.database import engine
+
+ARCHIVE_TABLES = ["archived_applications", "archived_notifications", "archived_sms_logs"]
+
+# Archive tables used to reuse the hot tables' ids as their primary key, which
+# collides once SQLite hands those ids out again. Rebuild them with their own
+# archive_id key and the original id in source_id.
+db_path = 'farmer_support.db'
+if os.path.exists(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    rebuilt = []
+    for table in ARCHIVE_TABLES:
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [row[1] for row in cursor.fetchall()]
+        if not columns or 'source_id' in columns:
+            continue
+        print(f"Rebuilding {table} with its own primary key...")
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        # Indexes keep their names across the rename and would clash with the new table's
+        cursor.execute(f"SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = '{table}_old' AND sql IS NOT NULL")
+        for (index,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX {index}")
+        rebuilt.append((table, columns))
+    conn.commit()
+
+    if rebuilt:
+        models.Base.metadata.create_all(bind=engine, tables=[models.Base.metadata.tables[t] for t, _ in rebuilt])
+        for table, columns in rebuilt:
+            copied = [c for c in columns if c != 'id' and c in models.Base.metadata.tables[table].columns]
+            cursor.execute(f"""
+            INSERT INTO {table} (source_id, {', '.join(copied)})
+            SELECT id, {', '.join(copied)} FROM {table}_old ORDER BY id
+            """)
+            cursor.execute(f"DROP TABLE {table}_old")
+
+    conn.commit()
+    conn.close()
+    print("Archive tables migrated successfully.")
+else:
+    print("Database file not found.")
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Tests import the app package the same way the server does, from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never touch the development database; limits would throttle the client's rapid requests
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"))
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Imported here so the environment above is in place first
+    from app import models
+    from app.database import engine
+    from app.main import app
+    from app.services import scheme_cache, user_cache
+
+    # The SMS gateway log is written relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    user_cache.invalidate()
+    scheme_cache.bump_version()
+    with TestClient(app) as client:
+        yield client
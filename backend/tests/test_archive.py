@@ -0,0 +1,96 @@
+from sqlalchemy import func, select
+
+from app import models
+from app.database import SessionLocal
+
+
+def login(client, phone_number, role="farmer"):
+    client.post("/register", json={"full_name": "F", "phone_number": phone_number, "password": "pw", "role": role})
+    token = client.post("/token", data={"username": phone_number, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def closed_scheme(client, admin, title):
+    return client.post("/schemes", headers=admin, json={
+        "title": title, "description": "d", "eligibility_criteria": "e", "required_documents": "x",
+        "deadline": "2020-01-01", "district_quotas": '{"Pune": 1}', "reservations": "{}",
+    }).json()["id"]
+
+
+def apply(client, farmer, scheme_id):
+    response = client.post(f"/apply/{scheme_id}", headers=farmer, json={
+        "scheme_id": scheme_id, "applicant_name": "F", "aadhaar_number": "1234", "income": 50000,
+        "land_size": 1.0, "district": "Pune", "category": "General",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["application_id"]
+
+
+def row_count(table):
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(table)).scalar()
+
+
+def application_messages(table):
+    # Registration SMS and the like belong to no application and stay behind
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).select_from(table).where(table.c.message.like("%APP-%"))).scalar()
+
+
+def source_id(application_id):
+    with SessionLocal() as db:
+        return db.query(models.Application.id).filter(models.Application.application_id == application_id).scalar()
+
+
+def test_archive_again_after_ids_are_reused(client):
+    admin = login(client, "900", role="admin")
+    farmers = [login(client, phone) for phone in ("901", "902")]
+
+    first = closed_scheme(client, admin, "Kharif 2019")
+    first_ids = [apply(client, farmer, first) for farmer in farmers]
+    first_pks = [source_id(application_id) for application_id in first_ids]
+    client.post(f"/schemes/{first}/allocate", headers=admin)
+    summary = client.post("/admin/archive", headers=admin).json()
+    assert summary["schemes"] == [first]
+    assert summary["applications"] == 2
+
+    # With the highest rows gone, SQLite hands the archived ids out again
+    second = closed_scheme(client, admin, "Rabi 2019")
+    second_id = apply(client, farmers[0], second)
+    second_pk = source_id(second_id)
+    assert second_pk in first_pks
+    client.post(f"/schemes/{second}/allocate", headers=admin)
+    response = client.post("/admin/archive", headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.json()["schemes"] == [second]
+
+    assert row_count(models.archived_applications) == 3
+    assert row_count(models.Application.__table__) == 0
+    assert application_messages(models.Notification.__table__) == 0
+    assert application_messages(models.SMSLog.__table__) == 0
+
+    # Both archived applications keep their original ids and their own messages
+    for application_id, pk in ((first_ids[0], first_pks[0]), (second_id, second_pk)):
+        history = client.get(f"/archive/applications/{application_id}", headers=farmers[0]).json()
+        assert history["application"]["id"] == pk
+        assert history["notifications"]
+        assert all(application_id in n["message"] for n in history["notifications"])
+        assert all(application_id in s["message"] for s in history["sms_logs"])
+
+    assert client.post("/admin/archive", headers=admin).json()["schemes"] == []
+
+
+def test_allocated_scheme_rejects_new_applications(client):
+    admin = login(client, "900", role="admin")
+    farmer = login(client, "901")
+    scheme_id = closed_scheme(client, admin, "Kharif 2019")
+    apply(client, farmer, scheme_id)
+    client.post(f"/schemes/{scheme_id}/allocate", headers=admin)
+
+    body = {"scheme_id": scheme_id, "applicant_name": "F", "aadhaar_number": "1234", "income": 50000,
+            "land_size": 1.0, "district": "Pune", "category": "General"}
+    assert client.post(f"/apply/{scheme_id}", headers=farmer, json=body).status_code == 400
+    # Archiving removes the application the duplicate check relied on; the scheme stays closed
+    assert client.post("/admin/archive", headers=admin).json()["applications"] == 1
+    assert client.post(f"/apply/{scheme_id}", headers=farmer, json=body).status_code == 400
+    assert row_count(models.Application.__table__) == 0
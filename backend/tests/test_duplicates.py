@@ -0,0 +1,168 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.services import duplicates, thumbnails
+from app.services.duplicates import BANDS, MAX_DISTANCE
+
+
+def random_hash(rng):
+    return f"{rng.getrandbits(64):016x}"
+
+
+def flip(phash, rng, count):
+    bits = int(phash, 16)
+    for bit in rng.sample(range(64), count):
+        bits ^= 1 << bit
+    return f"{bits:016x}"
+
+
+def spread_flip(phash, count):
+    # Worst case for banding: each flipped bit in a different band
+    bits = int(phash, 16)
+    for band in range(count):
+        bits ^= 1 << (band * (64 // BANDS))
+    return f"{bits:016x}"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_application(db, farmer_id, scheme_id=1):
+    app_record = models.Application(
+        application_id=f"APP-{len(db.query(models.Application).all()) + 1:08X}",
+        farmer_id=farmer_id, scheme_id=scheme_id, applicant_name="F", district="Pune", category="General"
+    )
+    db.add(app_record)
+    db.flush()
+    return app_record
+
+
+def import_with_env(**env):
+    return subprocess.run(
+        [sys.executable, "-c", "from app.services import duplicates; print(duplicates.aadhaar_hash('1234 5678 9012'))"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={k: v for k, v in os.environ.items() if k not in ("SECRET_KEY", "AADHAAR_HASH_KEY")} | env,
+        capture_output=True, text=True,
+    )
+
+
+def test_aadhaar_hash_key_is_independent_of_secret_key():
+    first = import_with_env(SECRET_KEY="one", AADHAAR_HASH_KEY="k")
+    rotated = import_with_env(SECRET_KEY="two", AADHAAR_HASH_KEY="k")
+    assert first.returncode == 0, first.stderr
+    assert first.stdout == rotated.stdout
+
+
+def test_configured_secret_key_requires_aadhaar_hash_key():
+    result = import_with_env(SECRET_KEY="production-secret")
+    assert result.returncode != 0
+    assert "AADHAAR_HASH_KEY must be set" in result.stderr
+
+
+def scan(path, brightness=1.0, seed=0):
+    from PIL import Image, ImageDraw, ImageEnhance
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", (1600, 1200), "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(1600), rng.randrange(1200)
+        draw.rectangle([x, y, x + rng.randrange(400), y + rng.randrange(300)], fill=tuple(rng.randrange(256) for _ in range(3)))
+    ImageEnhance.Brightness(image).enhance(brightness).save(path, "JPEG", quality=80)
+    return str(path)
+
+
+def test_rescanned_document_hashes_close(tmp_path):
+    pytest.importorskip("PIL")
+    original = duplicates.perceptual_hash(thumbnails.load_image(scan(tmp_path / "a.jpg")))
+    rescan = duplicates.perceptual_hash(thumbnails.load_image(scan(tmp_path / "b.jpg", brightness=1.1)))
+    other = duplicates.perceptual_hash(thumbnails.load_image(scan(tmp_path / "c.jpg", seed=1)))
+    assert duplicates.distance(original, rescan) <= MAX_DISTANCE
+    assert duplicates.distance(original, other) > MAX_DISTANCE
+
+
+def test_non_images_get_no_hash(tmp_path):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.4 not an image")
+    assert thumbnails.load_image(str(path)) is None
+    assert duplicates.perceptual_hash(None) is None
+    assert thumbnails.make_derivatives(str(path), None) is None
+
+
+def test_max_distance_leaves_a_shared_band():
+    assert MAX_DISTANCE < BANDS
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_near_duplicates_share_a_band(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        phash = random_hash(rng)
+        for other in (flip(phash, rng, rng.randint(0, MAX_DISTANCE)), spread_flip(phash, MAX_DISTANCE)):
+            assert duplicates.distance(phash, other) <= MAX_DISTANCE
+            assert any(a == b for a, b in zip(duplicates.bands(phash), duplicates.bands(other)))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_upload_check_finds_near_duplicates(db, seed):
+    rng = random.Random(seed)
+    phash = random_hash(rng)
+    original = add_application(db, farmer_id=1)
+    assert duplicates.check_upload(db, original, {"ration_card": phash}) == []
+
+    variants = [spread_flip(phash, MAX_DISTANCE)] + [flip(phash, rng, rng.randint(0, MAX_DISTANCE)) for _ in range(5)]
+    for i, variant in enumerate(variants):
+        app_record = add_application(db, farmer_id=100 + i)
+        findings = duplicates.check_upload(db, app_record, {"income_certificate": variant})
+        assert duplicates.document_finding("income_certificate", original.application_id) in findings
+
+
+def test_upload_check_ignores_distant_hashes_and_own_documents(db):
+    phash = "0123456789abcdef"
+    original = add_application(db, farmer_id=1)
+    duplicates.check_upload(db, original, {"ration_card": phash})
+
+    # One bit past the limit, all in the last band, so the other bands still match
+    distant = add_application(db, farmer_id=2)
+    assert duplicates.distance(phash, "0123456789abcde0") == MAX_DISTANCE + 1
+    assert duplicates.check_upload(db, distant, {"ration_card": "0123456789abcde0"}) == []
+    # The farmer's own other documents don't count
+    assert duplicates.check_upload(db, original, {"income_certificate": phash}) == []
+    other_scheme = add_application(db, farmer_id=3, scheme_id=2)
+    assert duplicates.check_upload(db, other_scheme, {"ration_card": phash}) == []
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sweep_pairs_match_brute_force(db, seed):
+    rng = random.Random(seed)
+    originals = [random_hash(rng) for _ in range(5)]
+    for farmer_id in range(1, 41):
+        base = rng.choice(originals)
+        app_record = add_application(db, farmer_id=farmer_id)
+        db.add_all(duplicates.fingerprints(app_record, {"ration_card": flip(base, rng, rng.randint(0, 5))}))
+    db.flush()
+
+    rows, pairs, skipped = duplicates._similar_document_pairs(db, 1)
+    assert skipped == 0
+    found = {tuple(sorted((rows[a].pk, rows[b].pk))) for a, b in pairs}
+    brute = {
+        tuple(sorted((a.pk, b.pk)))
+        for i, a in enumerate(rows) for b in rows[i + 1:]
+        if a.farmer_id != b.farmer_id and duplicates.distance(a.phash, b.phash) <= MAX_DISTANCE
+    }
+    assert found == brute
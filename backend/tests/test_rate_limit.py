@@ -0,0 +1,67 @@
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import InMemoryBucketStore, TokenBucketLimiter
+
+
+def test_refund_gives_a_token_back_up_to_capacity():
+    store = InMemoryBucketStore()
+    assert store.take("k", rate=0.001, capacity=2) == (True, 0.0)
+    assert store.take("k", rate=0.001, capacity=2)[0]
+    assert not store.take("k", rate=0.001, capacity=2)[0]
+    store.refund("k", capacity=2)
+    assert store.take("k", rate=0.001, capacity=2)[0]
+    store.refund("k", capacity=2)
+    store.refund("k", capacity=2)
+    store.refund("k", capacity=2)
+    assert store._buckets["k"][0] == 2
+    store.refund("unknown", capacity=2)
+    assert "unknown" not in store._buckets
+
+
+def test_store_evicts_least_recently_used_keys():
+    store = InMemoryBucketStore(max_keys=2)
+    store.take("a", rate=1, capacity=1)
+    store.take("b", rate=1, capacity=1)
+    store.take("a", rate=1, capacity=1)
+    store.take("c", rate=1, capacity=1)
+    assert list(store._buckets) == ["a", "c"]
+
+
+@pytest.mark.parametrize("per_minute, burst", [(0, 5), (5, 0), (-1, 5)])
+def test_limiter_rejects_non_positive_limits(per_minute, burst):
+    with pytest.raises(ValueError):
+        TokenBucketLimiter("test", per_minute, burst)
+
+
+def test_idempotent_retries_are_refunded(client, monkeypatch):
+    monkeypatch.setattr(rate_limit, "ENABLED", True)
+    monkeypatch.setattr(rate_limit, "APPLY_BY_PHONE", TokenBucketLimiter("apply_phone", 0.001, 2))
+
+    client.post("/register", json={"full_name": "A", "phone_number": "900", "password": "pw", "role": "admin"})
+    client.post("/register", json={"full_name": "F", "phone_number": "901", "password": "pw"})
+    admin = {"Authorization": "Bearer " + client.post("/token", data={"username": "900", "password": "pw"}).json()["access_token"]}
+    farmer = {"Authorization": "Bearer " + client.post("/token", data={"username": "901", "password": "pw"}).json()["access_token"]}
+    schemes = [client.post("/schemes", headers=admin, json={
+        "title": title, "description": "d", "eligibility_criteria": "e", "required_documents": "x",
+        "deadline": "2030-01-01", "district_quotas": '{"Pune": 1}', "reservations": "{}",
+    }).json()["id"] for title in ("Kharif", "Rabi", "Zaid")]
+
+    def apply(scheme_id, key):
+        return client.post(f"/apply/{scheme_id}", headers={**farmer, "Idempotency-Key": key}, json={
+            "scheme_id": scheme_id, "applicant_name": "F", "aadhaar_number": "1234", "income": 50000,
+            "land_size": 1.0, "district": "Pune", "category": "General",
+        })
+
+    first = apply(schemes[0], "k1")
+    assert first.status_code == 200
+    # One token left: each retry spends it and gets it back
+    for _ in range(3):
+        retry = apply(schemes[0], "k1")
+        assert retry.status_code == 200
+        assert retry.json()["application_id"] == first.json()["application_id"]
+
+    assert apply(schemes[1], "k2").status_code == 200
+    # The bucket is empty now, so even a retry is shed before it reaches the database
+    assert apply(schemes[2], "k3").status_code == 429
+    assert apply(schemes[0], "k1").status_code == 429
@@ -0,0 +1,198 @@
+import random
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rolling_allocation
+from app.services.allocation import allocate_district, rank
+from app.services.rolling_allocation import DistrictState, SchemeState
+
+CATEGORIES = ["General", "General", "SC", "ST", "OBC"]
+RESERVATIONS = [
+    {"scPercentage": 0, "stPercentage": 0},
+    {"scPercentage": 15, "stPercentage": 7.5},
+    {"scPercentage": 50, "stPercentage": 50},
+    # Over 100%: SC takes its share first, ST only gets what is left
+    {"scPercentage": 80, "stPercentage": 60},
+    {"scPercentage": 100, "stPercentage": 100},
+]
+
+
+def random_case(rng):
+    # Few distinct scores so ties are common
+    scores = [rng.choice([10.0, 25.5, 25.5, 50.0, 77.25, 100.0]) for _ in range(rng.randint(0, 40))]
+    candidates = [(i + 1, score, rng.choice(CATEGORIES)) for i, score in enumerate(scores)]
+    return candidates, rng.randint(0, 15), rng.choice(RESERVATIONS)
+
+
+def expected(candidates, seats, reservations):
+    result = allocate_district(rank(candidates), seats, reservations)
+    return {c[0] for c in result.allocated}, {c[0] for c in result.waitlist}, result.reserved
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_incremental_adds_match_allocate_district(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        candidates, seats, reservations = random_case(rng)
+        state = DistrictState(seats, reservations)
+        arrivals = list(candidates)
+        rng.shuffle(arrivals)
+        for candidate in arrivals:
+            state.add(candidate)
+
+        winners, waitlist, reserved = expected(candidates, seats, reservations)
+        assert set(state.winner_ids()) == winners
+        assert set(state.waitlist_ids()) == waitlist
+        assert state.summary()["reserved"] == reserved
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_from_ranked_then_adds_match_allocate_district(seed):
+    rng = random.Random(1000 + seed)
+    for _ in range(100):
+        candidates, seats, reservations = random_case(rng)
+        split = rng.randint(0, len(candidates))
+        state = DistrictState.from_ranked(rank(candidates[:split]), seats, reservations)
+        for candidate in candidates[split:]:
+            state.add(candidate)
+
+        winners, waitlist, _ = expected(candidates, seats, reservations)
+        assert set(state.winner_ids()) == winners
+        assert set(state.waitlist_ids()) == waitlist
+
+
+def test_duplicate_add_is_ignored():
+    state = DistrictState(1, {"scPercentage": 0, "stPercentage": 0})
+    state.add((1, 50.0, "General"))
+    state.add((1, 50.0, "General"))
+    assert state.winner_ids() == [1]
+    assert state.waitlist_ids() == []
+
+
+def test_position_of_unknown_id_is_none():
+    state = DistrictState(1, {"scPercentage": 0, "stPercentage": 0})
+    state.add((1, 50.0, "General"))
+    assert state.position(2, 40.0) is None
+    assert state.position(1, 50.0)["seat_type"] == "merit"
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_removals_match_allocate_district(seed):
+    rng = random.Random(2000 + seed)
+    for _ in range(50):
+        candidates, seats, reservations = random_case(rng)
+        split = rng.randint(0, len(candidates))
+        state = DistrictState.from_ranked(rank(candidates[:split]), seats, reservations)
+        present = dict((c[0], c) for c in candidates[:split])
+        pending = list(candidates[split:])
+        # Interleave applies, rejections and applications going back to PENDING
+        for _ in range(3 * len(candidates)):
+            if pending and (not present or rng.random() < 0.5):
+                candidate = pending.pop(rng.randrange(len(pending)))
+                state.add(candidate)
+                present[candidate[0]] = candidate
+            elif present:
+                app_id = rng.choice(list(present))
+                state.remove(app_id)
+                pending.append(present.pop(app_id))
+
+            winners, waitlist, reserved = expected(list(present.values()), seats, reservations)
+            assert set(state.winner_ids()) == winners
+            assert set(state.waitlist_ids()) == waitlist
+            assert state.summary()["reserved"] == reserved
+            assert set(state.location) == set(present)
+
+
+def test_remove_unknown_id_is_ignored():
+    state = DistrictState(1, {"scPercentage": 0, "stPercentage": 0})
+    state.add((1, 50.0, "General"))
+    state.remove(2)
+    state.remove(1)
+    state.remove(1)
+    assert state.winner_ids() == []
+    assert state.summary()["applicants"] == 0
+
+
+def test_removed_reserved_seat_is_refilled_from_category():
+    state = DistrictState(4, {"scPercentage": 50, "stPercentage": 0})
+    for candidate in [(1, 90.0, "SC"), (2, 80.0, "SC"), (3, 70.0, "SC"), (4, 60.0, "General"), (5, 10.0, "SC")]:
+        state.add(candidate)
+    assert sorted(state.waitlist_ids()) == [5]
+    state.remove(1)
+    # SC 3 moves from merit to the reserved seat, the waitlisted SC 5 takes the merit seat
+    assert state.position(3, 70.0)["seat_type"] == "SC"
+    assert state.position(5, 10.0)["seat_type"] == "merit"
+    assert state.position(2, 80.0)["district_rank"] == 1
+
+
+def test_stale_entries_are_compacted():
+    state = DistrictState(2, {"scPercentage": 0, "stPercentage": 0})
+    for app_id in range(1, 5001):
+        state.add((app_id, float(app_id % 97), "General"))
+        if app_id > 3:
+            state.remove(app_id - 3)
+    assert len(state.candidates) == 3
+    assert len(state.merit) + len(state.waitlist) < 200
+
+
+def scheme(scheme_id):
+    return SimpleNamespace(id=scheme_id, district_quotas='{"Pune": 1}', reservations="{}")
+
+
+def built(scheme_id, *candidates):
+    districts = {"Pune": DistrictState.from_ranked(rank(list(candidates)), 1, {})}
+    return SchemeState(scheme_id, rolling_allocation._config_key(scheme(scheme_id)), districts)
+
+
+def test_build_runs_outside_the_registry_lock(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_build(db, s):
+        started.set()
+        assert release.wait(5)
+        return built(s.id, (1, 50.0, "General"))
+
+    monkeypatch.setattr(rolling_allocation, "_build", slow_build)
+    monkeypatch.setattr(rolling_allocation, "_states", {-2: built(-2, (10, 50.0, "General"))})
+    monkeypatch.setattr(rolling_allocation, "_builds", {})
+
+    builder = threading.Thread(target=rolling_allocation.get_state, args=(None, scheme(-1)))
+    builder.start()
+    assert started.wait(5)
+
+    # Other schemes aren't held up by the scan
+    rolling_allocation.add_application(-2, 11, 90.0, "General", "Pune")
+    assert rolling_allocation.get_state(None, scheme(-2)).districts["Pune"].winner_ids() == [11]
+
+    # Changes to the scheme being built are replayed onto the result
+    rolling_allocation.add_application(-1, 2, 90.0, "General", "Pune")
+    rolling_allocation.add_application(-1, 3, 70.0, "General", "Pune")
+    rolling_allocation.remove_application(-1, 2, "Pune")
+    release.set()
+    builder.join(5)
+
+    state = rolling_allocation.get_state(None, scheme(-1))
+    assert state.districts["Pune"].winner_ids() == [3]
+    assert state.districts["Pune"].waitlist_ids() == [1]
+
+
+def test_invalidated_build_is_not_kept(monkeypatch):
+    builds = []
+
+    def build(db, s):
+        builds.append(s.id)
+        if len(builds) == 1:
+            rolling_allocation.invalidate(s.id)
+        return built(s.id, (1, 50.0, "General"))
+
+    monkeypatch.setattr(rolling_allocation, "_build", build)
+    monkeypatch.setattr(rolling_allocation, "_states", {})
+    monkeypatch.setattr(rolling_allocation, "_builds", {})
+
+    rolling_allocation.get_state(None, scheme(-1))
+    assert rolling_allocation._states == {}
+    rolling_allocation.get_state(None, scheme(-1))
+    assert list(rolling_allocation._states) == [-1]
+    assert builds == [-1, -1]
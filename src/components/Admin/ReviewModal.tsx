@@ -102,26 +102,48 @@ export const ReviewModal: React.FC<ReviewModalProps> = ({ application, onClose,
                             <h3 className="text-[10px] font-black text-gray-400 uppercase tracking-widest mb-3">Supporting Documents</h3>
                             <div className="space-y-4">
                                 {[
-                                    { label: '7/12 Extract', path: application.document_7_12 },
-                                    { label: 'Income Certificate', path: application.income_certificate },
-                                    { label: 'Ration Card', path: application.ration_card }
+                                    { label: '7/12 Extract', path: application.document_7_12, previews: application.document_previews?.document_7_12 },
+                                    { label: 'Income Certificate', path: application.income_certificate, previews: application.document_previews?.income_certificate },
+                                    { label: 'Ration Card', path: application.ration_card, previews: application.document_previews?.ration_card }
                                 ].map((doc, i) => (
                                     <div key={i} className="group flex items-center justify-between bg-white p-5 rounded-2xl border border-gray-100 hover:border-green-400 transition-all hover:shadow-lg">
                                         <div className="flex items-center gap-4">
-                                            <div className="w-10 h-10 bg-gray-50 flex items-center justify-center rounded-xl text-green-600 group-hover:bg-green-50 transition-colors">
-                                                <svg className="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth="2" d="M9 12h6m-6 4h6m2 5H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z" /></svg>
-                                            </div>
+                                            {doc.previews ? (
+                                                // Small thumbnail first; the full scan is only fetched on demand
+                                                <img
+                                                    src={docUrl(doc.previews.thumbnail)!}
+                                                    alt={doc.label}
+                                                    loading="lazy"
+                                                    className="w-10 h-10 object-cover rounded-xl border border-gray-100"
+                                                />
+                                            ) : (
+                                                <div className="w-10 h-10 bg-gray-50 flex items-center justify-center rounded-xl text-green-600 group-hover:bg-green-50 transition-colors">
+                                                    <svg className="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth="2" d="M9 12h6m-6 4h6m2 5H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z" /></svg>
+                                                </div>
+                                            )}
                                             <span className="font-bold text-gray-700">{doc.label}</span>
                                         </div>
                                         {doc.path ? (
-                                            <a
-                                                href={docUrl(doc.path)!}
-                                                target="_blank"
-                                                rel="noopener noreferrer"
-                                                className="bg-green-900 text-white px-4 py-2 rounded-xl text-[10px] font-black uppercase tracking-widest hover:bg-green-800 transition-colors text-center"
-                                            >
-                                                View
-                                            </a>
+                                            <div className="flex items-center gap-2">
+                                                <a
+                                                    href={docUrl(doc.previews?.preview ?? doc.path)!}
+                                                    target="_blank"
+                                                    rel="noopener noreferrer"
+                                                    className="bg-green-900 text-white px-4 py-2 rounded-xl text-[10px] font-black uppercase tracking-widest hover:bg-green-800 transition-colors text-center"
+                                                >
+                                                    View
+                                                </a>
+                                                {doc.previews && (
+                                                    <a
+                                                        href={docUrl(doc.path)!}
+                                                        target="_blank"
+                                                        rel="noopener noreferrer"
+                                                        className="text-green-900 px-2 py-2 rounded-xl text-[10px] font-black uppercase tracking-widest hover:bg-green-50 transition-colors text-center"
+                                                    >
+                                                        Original
+                                                    </a>
+                                                )}
+                                            </div>
                                         ) : (
                                             <span className="text-[10px] font-black uppercase tracking-widest text-red-500">Missing</span>
                                         )}
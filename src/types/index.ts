@@ -42,6 +42,7 @@ export interface FarmerApplication {
   document_7_12?: string;
   income_certificate?: string;
   ration_card?: string;
+  document_previews?: Record<string, { preview: string; thumbnail: string }>;
 }
 
 export interface DistrictQuota {